@@ -0,0 +1,115 @@
+"""
+Throughput and peak memory of avatar preprocessing per upload size, against decoding the
+full image and cropping it (what a straightforward Pillow version would do).
+
+Each case runs in a fresh process, so the reported peak RSS belongs to that case only. The
+images are generated in a process of their own too: Linux carries the peak RSS of a parent
+over into the children it starts.
+
+Usage::
+
+    python benchmarks/bench_avatars.py [--iterations 20] [--sizes 640x480,1920x1080,4032x3024,6000x4000]
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from PIL import Image, ImageOps
+
+from src.services.avatars import prepare_avatar
+
+
+AVATAR_SIZE = 250
+
+
+def peak_rss() -> int:
+    # Linux reports kilobytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def full_decode(source: Path, size: int) -> bytes:
+    with Image.open(source) as image:
+        avatar = ImageOps.fit(image.convert("RGB"), (size, size), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    avatar.save(buffer, "JPEG", quality=85, optimize=True)
+    return buffer.getvalue()
+
+
+def make_image(path: Path, width: int, height: int, fmt: str):
+    gradient = Image.linear_gradient("L")
+    image = Image.merge(
+        "RGB",
+        (
+            gradient.resize((width, height)),
+            gradient.rotate(90).resize((width, height)),
+            Image.effect_noise((width, height), 64),
+        ),
+    )
+    image.save(path, fmt, quality=90)
+
+
+def run_case(method: str, source: str, iterations: int):
+    # Child process: one method, one image
+    process = {"prepare_avatar": prepare_avatar, "full_decode": full_decode}[method]
+    path = Path(source)
+    baseline = peak_rss()
+    process(path, AVATAR_SIZE)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        process(path, AVATAR_SIZE)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"per_second": iterations / elapsed, "baseline": baseline, "rss": peak_rss()}))
+
+
+def child(*args: str) -> str:
+    return subprocess.run(
+        [sys.executable, __file__, *args], check=True, capture_output=True, text=True
+    ).stdout
+
+
+def measure(method: str, source: Path, iterations: int) -> dict:
+    output = child("--case", method, str(source), "--iterations", str(iterations))
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(iterations: int, sizes: list):
+    print(f"{'image':<18}{'bytes':>11}  {'method':<15}{'images/s':>10}{'peak RSS':>13}{'baseline':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in ("JPEG", "PNG"):
+            for width, height in sizes:
+                source = Path(tmp) / f"{width}x{height}.{fmt.lower()}"
+                child("--make", str(source), f"{width}x{height}", fmt)
+                label = f"{fmt} {width}x{height}"
+                for method in ("full_decode", "prepare_avatar"):
+                    result = measure(method, source, iterations)
+                    print(
+                        f"{label:<18}{source.stat().st_size:>11}  {method:<15}"
+                        f"{result['per_second']:>10.1f}{result['rss'] / 2 ** 20:>9.1f} MiB"
+                        f"{result['baseline'] / 2 ** 20:>9.1f} MiB"
+                    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--sizes", default="640x480,1920x1080,4032x3024,6000x4000")
+    parser.add_argument("--case", nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument("--make", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.case:
+        run_case(*args.case, args.iterations)
+    elif args.make:
+        path, size, fmt = args.make
+        make_image(Path(path), *map(int, size.split("x")), fmt)
+    else:
+        sizes = [tuple(map(int, size.split("x"))) for size in args.sizes.split(",")]
+        main(args.iterations, sizes)
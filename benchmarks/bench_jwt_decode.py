@@ -0,0 +1,46 @@
+"""
+Per-request cost of verifying an access token, with and without the decode cache.
+
+Usage::
+
+    python benchmarks/bench_jwt_decode.py [--iterations 20000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from jose import jwt
+
+from src.services.auth import Auth
+from src.services.token_cache import TokenCache
+
+
+async def main(iterations: int):
+    auth = Auth()
+    auth.token_cache = TokenCache(maxsize=10000)
+    token = await auth.create_access_token(data={"sub": "bench@example.com"})
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+    uncached = (time.perf_counter() - start) / iterations
+
+    await auth.decode_access_token(token)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await auth.decode_access_token(token)
+    cached = (time.perf_counter() - start) / iterations
+
+    print(f"jwt.decode:            {uncached * 1e6:8.2f} us/request")
+    print(f"decode_access_token:   {cached * 1e6:8.2f} us/request (cached)")
+    print(f"saving:                {(uncached - cached) * 1e6:8.2f} us/request ({uncached / cached:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    asyncio.run(main(parser.parse_args().iterations))
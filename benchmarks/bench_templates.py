@@ -0,0 +1,69 @@
+"""
+Cost of rendering confirmation emails: a fresh Jinja environment per message (what
+building ``FastMail(conf)`` per message did) against the compiled template cache.
+
+Usage::
+
+    python benchmarks/bench_templates.py [--messages 100000] [--baseline-messages 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from src.services.templates import TEMPLATE_FOLDER, TemplateService
+
+
+TEMPLATE = "email_template.html"
+
+
+def contexts(count: int):
+    return [
+        {"host": "https://example.com/", "username": f"user{i}", "token": f"token-{i:08d}"}
+        for i in range(count)
+    ]
+
+
+def main(messages: int, baseline_messages: int):
+    batch = contexts(messages)
+
+    start = time.perf_counter()
+    for context in batch[:baseline_messages]:
+        environment = Environment(
+            loader=FileSystemLoader(TEMPLATE_FOLDER), autoescape=select_autoescape()
+        )
+        environment.get_template(TEMPLATE).render(context)
+    fresh = (time.perf_counter() - start) / baseline_messages
+
+    start = time.perf_counter()
+    templates = TemplateService()
+    templates.load()
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for context in batch:
+        templates.render(TEMPLATE, **context)
+    cached = (time.perf_counter() - start) / messages
+
+    start = time.perf_counter()
+    templates.render_many(TEMPLATE, batch)
+    bulk = (time.perf_counter() - start) / messages
+
+    print(f"messages:                 {messages}")
+    print(f"load (once):              {load * 1e3:8.2f} ms")
+    print(f"fresh environment:        {fresh * 1e6:8.2f} us/message ({baseline_messages} messages)")
+    print(f"compiled, render:         {cached * 1e6:8.2f} us/message ({fresh / cached:.0f}x)")
+    print(f"compiled, render_many:    {bulk * 1e6:8.2f} us/message ({fresh / bulk:.0f}x)")
+    print(f"render_many total:        {bulk * messages:8.2f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--baseline-messages", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.messages, args.baseline_messages)
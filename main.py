@@ -1,11 +1,13 @@
 from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
 import uvicorn
 
-from src.routes import contacts, auth, users
 from src.conf.config import settings
+from src.routes import contacts, auth, users, internal
+from src.services.hashing import password_hasher
+from src.services.invalidation import invalidation_bus
+from src.services.rate_limit import RateLimitHeadersMiddleware
 
-import redis.asyncio as redis
-from fastapi_limiter import FastAPILimiter
 from fastapi.middleware.cors import CORSMiddleware
 
 
@@ -19,29 +21,48 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "ETag",
+        "Retry-After",
+        "RateLimit-Policy",
+        "RateLimit-Limit",
+        "RateLimit-Remaining",
+        "RateLimit-Reset",
+    ],
 )
+app.add_middleware(RateLimitHeadersMiddleware)
 
 app.include_router(auth.router, prefix="/api")
 app.include_router(contacts.router, prefix="/api")
 app.include_router(contacts.router_b, prefix="/api")
 app.include_router(users.router, prefix="/api")
+app.include_router(internal.router, prefix="/api")
+
+if settings.avatar_storage == "local":
+    app.mount(
+        settings.avatar_local_url,
+        StaticFiles(directory=settings.avatar_local_dir, check_dir=False),
+        name="avatars",
+    )
 
 
 async def startup_event():
     """
     Function to run on application startup.
     """
-    r = await redis.Redis(
-        host=settings.redis_host,
-        port=settings.redis_port,
-        db=0,
-        encoding="utf-8",
-        decode_responses=True,
-    )
-    await FastAPILimiter.init(r)
+    invalidation_bus.start()
+
+
+async def shutdown_event():
+    """
+    Function to run on application shutdown.
+    """
+    await invalidation_bus.stop()
+    password_hasher.shutdown()
 
 
 app.add_event_handler("startup", startup_event)
+app.add_event_handler("shutdown", shutdown_event)
 
 
 @app.get("/")
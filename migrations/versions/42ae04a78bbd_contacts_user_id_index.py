@@ -0,0 +1,27 @@
+"""Contacts user_id index
+
+Revision ID: 42ae04a78bbd
+Revises: dc00d6299627
+Create Date: 2026-10-18 10:41:52.880137
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '42ae04a78bbd'
+down_revision: Union[str, None] = 'dc00d6299627'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Serves per-user lookups, keyset pages and the ON DELETE CASCADE from users
+    op.create_index('ix_contacts_user_id_id', 'contacts', ['user_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_id', table_name='contacts')
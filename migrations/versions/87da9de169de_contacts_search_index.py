@@ -0,0 +1,35 @@
+"""Contacts search index
+
+Revision ID: 87da9de169de
+Revises: 939bbc404e76
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '87da9de169de'
+down_revision: Union[str, None] = '939bbc404e76'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Trigram index behind the contacts "q" search, Postgres only
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        "CREATE INDEX ix_contacts_search_trgm ON contacts "
+        "USING gin ((first_name || ' ' || last_name || ' ' || email) gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_contacts_search_trgm")
@@ -0,0 +1,29 @@
+"""Drop users refresh_token
+
+Revision ID: 941cdf15ea10
+Revises: 42ae04a78bbd
+Create Date: 2026-10-18 12:07:31.402615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '941cdf15ea10'
+down_revision: Union[str, None] = '42ae04a78bbd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Refresh-token state lives in Redis (src/services/refresh_tokens.py)
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('refresh_token')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('refresh_token', sa.String(length=255), nullable=True))
@@ -0,0 +1,37 @@
+"""Contacts birthday key
+
+Revision ID: dc00d6299627
+Revises: 87da9de169de
+Create Date: 2026-10-18 10:04:17.503911
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'dc00d6299627'
+down_revision: Union[str, None] = '87da9de169de'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('birthday_key', sa.Integer(), nullable=True))
+    contacts = sa.table('contacts', sa.column('birthday', sa.DateTime()), sa.column('birthday_key', sa.Integer()))
+    op.execute(
+        contacts.update().values(
+            birthday_key=sa.extract('month', contacts.c.birthday) * 100
+            + sa.extract('day', contacts.c.birthday)
+        )
+    )
+    with op.batch_alter_table('contacts') as batch_op:
+        batch_op.alter_column('birthday_key', existing_type=sa.Integer(), nullable=False)
+    op.create_index('ix_contacts_user_id_birthday_key', 'contacts', ['user_id', 'birthday_key'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_birthday_key', table_name='contacts')
+    op.drop_column('contacts', 'birthday_key')
@@ -3,13 +3,46 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     sqlalchemy_database_url: str
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    sqlalchemy_replica_urls: str = ""
+    db_replica_retry_after: float = 30
     secret_key: str
     algorithm: str
+    internal_token: str = ""
+    token_cache_size: int = 10000
+    access_token_user_claims: bool = True
+    token_version_local_size: int = 10000
+    token_version_local_ttl: float = 300
+    bcrypt_rounds: int = 12
+    password_hash_executor: str = "thread"
+    password_hash_workers: int = 4
+    password_hash_max_pending: int = 64
+    password_hash_timeout: float = 5
     email_username: str
     email_password: str
     email_from: str
     email_port: int
     email_server: str
+    email_from_name: str = "Rest API Application"
+    email_use_tls: bool = True
+    email_start_tls: bool = False
+    email_timeout: float = 30
+    email_pool_size: int = 2
+    email_max_idle: float = 60
+    email_send_rate: float = 10
+    email_batch_size: int = 50
+    email_batch_window: float = 0.05
+    email_outbox_stream: str = "email-outbox"
+    email_outbox_group: str = "mailers"
+    email_outbox_dead_letter: str = "email-outbox:dead"
+    email_outbox_max_attempts: int = 5
+    email_outbox_backoff: float = 5
+    email_outbox_maxlen: int = 100000
+    email_worker_concurrency: int = 50
     postgres_user: str
     postgres_password: str
     postgres_db: str
@@ -17,9 +50,31 @@ class Settings(BaseSettings):
     postgres_port: int
     redis_host: str
     redis_port: int
+    user_cache_ttl: int = 21600
+    user_cache_local_size: int = 10000
+    user_cache_local_ttl: float = 60
+    user_cache_lock_ttl: float = 2
+    user_cache_early_refresh_beta: float = 1
+    contacts_cache_ttl: int = 300
+    rate_limit_local_size: int = 10000
     cloudinary_name: str
     cloudinary_api_key: str
     cloudinary_api_secret: str
+    avatar_storage: str = "cloudinary"
+    avatar_local_dir: str = "var/avatars"
+    avatar_local_url: str = "/static/avatars"
+    avatar_spool_dir: str = "var/avatars/spool"
+    avatar_max_size: int = 5242880
+    avatar_content_types: str = "image/jpeg,image/png,image/gif,image/webp"
+    avatar_size: int = 250
+    avatar_quality: int = 85
+    avatar_max_pixels: int = 40000000
+    avatar_upload_workers: int = 4
+    avatar_outbox_stream: str = "avatar-outbox"
+    avatar_outbox_group: str = "avatars"
+    avatar_outbox_dead_letter: str = "avatar-outbox:dead"
+    avatar_outbox_max_attempts: int = 3
+    avatar_worker_concurrency: int = 4
 
     class Config:
         env_file = ".env"
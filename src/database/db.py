@@ -1,15 +1,102 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from src.conf.config import settings
+from src.database.replicas import Replica, ReplicaRouter
+from src.services.metrics import PoolStats, registry
 
 
 SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """
+    Convert a sync database URL into its asyncio driver counterpart.
+
+    :param url: The sync database URL, e.g. ``postgresql://...``.
+    :type url: str
+    :return: The same URL using the async driver, e.g. ``postgresql+asyncpg://...``.
+    :rtype: str
+    """
+    sa_url = make_url(url)
+    backend = sa_url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}' databases")
+    return sa_url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(
+        hide_password=False
+    )
+
+
+def pool_options() -> dict:
+    """
+    Connection pool settings shared by the sync and async engines.
+
+    :return: Keyword arguments for ``create_engine`` / ``create_async_engine``.
+    :rtype: dict
+    """
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+SQLALCHEMY_ASYNC_DATABASE_URL = to_async_url(SQLALCHEMY_DATABASE_URL)
+
+pool_stats = PoolStats()
+sync_pool_stats = PoolStats()
+registry.register("db_pool", pool_stats.snapshot)
+registry.register("db_pool_sync", sync_pool_stats.snapshot)
+
+# Sync engine, kept for Alembic, scripts and tests
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=sync_pool_stats.instrument(QueuePool),
+    **pool_options(),
+)
 
 DBSession = sessionmaker(autocommit = False, autoflush = False, bind=engine)
 
+# Async engine, used by the API
+async_engine = create_async_engine(
+    SQLALCHEMY_ASYNC_DATABASE_URL,
+    poolclass=pool_stats.instrument(AsyncAdaptedQueuePool),
+    **pool_options(),
+)
+
+AsyncDBSession = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
+# Optional read replicas, used by read-only endpoints
+replica_router = ReplicaRouter(
+    AsyncDBSession,
+    [
+        Replica(
+            make_url(url).render_as_string(hide_password=True),
+            async_sessionmaker(
+                create_async_engine(to_async_url(url), **pool_options()),
+                autoflush=False,
+                expire_on_commit=False,
+            ),
+        )
+        for url in map(str.strip, settings.sqlalchemy_replica_urls.split(","))
+        if url
+    ],
+    retry_after=settings.db_replica_retry_after,
+)
+registry.register("db_replicas", replica_router.snapshot)
+
 
 # Dependency
 def get_db():
@@ -18,3 +105,37 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Dependency
+async def get_async_db():
+    async with AsyncDBSession() as db:
+        yield db
+
+
+# Dependency
+def get_async_sessionmaker():
+    """
+    Session factory for work that outlives the request scope, e.g. streamed responses.
+    """
+    return AsyncDBSession
+
+
+# Dependency
+async def get_async_read_db():
+    """
+    Read-only session, served by a read replica when one is configured and healthy.
+    """
+    db = await replica_router.open_session()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+# Dependency
+def get_async_read_sessionmaker():
+    """
+    Read-only session factory for streamed responses, see ``get_async_read_db``.
+    """
+    return replica_router.choose()
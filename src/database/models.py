@@ -1,26 +1,48 @@
-from datetime import datetime
+from datetime import date, datetime
 
-from sqlalchemy import String, DateTime, Boolean, func
+from sqlalchemy import String, DateTime, Boolean, Index, func
 from src.database.db import engine
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, validates
 from sqlalchemy.sql.schema import ForeignKey
 
 class Base(DeclarativeBase):
     pass
 
 
+def birthday_key(birthday: date) -> int:
+    """
+    Month-day key of a birthday, e.g. 1231 for December 31st.
+
+    :param birthday: The birthday.
+    :type birthday: date
+    :return: ``month * 100 + day``.
+    :rtype: int
+    """
+    return birthday.month * 100 + birthday.day
+
+
 class Contact(Base): 
     __tablename__ = "contacts"
+    __table_args__ = (
+        Index("ix_contacts_user_id_id", "user_id", "id"),
+        Index("ix_contacts_user_id_birthday_key", "user_id", "birthday_key"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True,)
     first_name: Mapped[str] = mapped_column(String(20))
     last_name: Mapped[str] = mapped_column(String(20))
     email: Mapped[str] = mapped_column(String(40))
     phone: Mapped[str] = mapped_column(String(20))
     birthday: Mapped[datetime] = mapped_column()
+    birthday_key: Mapped[int] = mapped_column()
     notes: Mapped[str] = mapped_column(String(250), nullable=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), default=1)
     user = relationship("User", backref="contacts")
 
+    @validates("birthday")
+    def _set_birthday_key(self, key, value):
+        self.birthday_key = birthday_key(value) if value is not None else None
+        return value
+
 class User(Base):
     __tablename__ = "users"
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -28,7 +50,6 @@ class User(Base):
     email: Mapped[str] = mapped_column(String(40), nullable=False, unique=True)
     password: Mapped[str] = mapped_column(String(255), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
-    refresh_token: Mapped[str] = mapped_column(String(255), nullable=True)
     avatar: Mapped[str] = mapped_column(String(255), nullable=True)
     confirmed: Mapped[bool] = mapped_column(Boolean, default=False)
 
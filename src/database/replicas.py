@@ -0,0 +1,110 @@
+import itertools
+import logging
+import time
+from typing import List
+
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+logger = logging.getLogger(__name__)
+
+
+class Replica:
+    """
+    A read replica session factory together with its health state.
+    """
+
+    def __init__(self, name: str, session_factory: async_sessionmaker):
+        self.name = name
+        self.session_factory = session_factory
+        self.down_until = 0.0
+        self.failures = 0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+
+class ReplicaRouter:
+    """
+    Routes read-only sessions to read replicas, falling back to the primary.
+
+    Replicas are picked round-robin among the healthy ones. A replica that fails to
+    hand out a connection is skipped for ``retry_after`` seconds, after which it is
+    tried again. When no replica is available the primary serves the read.
+    """
+
+    def __init__(
+        self,
+        primary: async_sessionmaker,
+        replicas: List[Replica],
+        retry_after: float = 30,
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.retry_after = retry_after
+        self._next = itertools.count()
+
+    def candidates(self) -> List[Replica]:
+        """
+        Healthy replicas in round-robin order for the next read.
+
+        :return: The replicas to try, in order.
+        :rtype: List[Replica]
+        """
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return []
+        start = next(self._next) % len(healthy)
+        return healthy[start:] + healthy[:start]
+
+    def choose(self) -> async_sessionmaker:
+        """
+        Pick a session factory for a read without checking connectivity.
+
+        :return: The factory of the next healthy replica, or of the primary.
+        :rtype: async_sessionmaker
+        """
+        candidates = self.candidates()
+        return candidates[0].session_factory if candidates else self.primary
+
+    def mark_down(self, replica: Replica):
+        """
+        Take a replica out of rotation for ``retry_after`` seconds.
+
+        :param replica: The failed replica.
+        :type replica: Replica
+        """
+        replica.failures += 1
+        replica.down_until = time.monotonic() + self.retry_after
+        logger.warning("Read replica %s is unavailable, using other nodes", replica.name)
+
+    async def open_session(self) -> AsyncSession:
+        """
+        Open a read-only session on the first replica that accepts a connection.
+
+        :return: A session bound to a replica, or to the primary if none is available.
+        :rtype: AsyncSession
+        """
+        for replica in self.candidates():
+            db = replica.session_factory()
+            try:
+                await db.connection()
+                return db
+            except (DBAPIError, OSError):
+                await db.close()
+                self.mark_down(replica)
+        return self.primary()
+
+    def snapshot(self) -> dict:
+        """
+        Report the health of every replica.
+
+        :return: Health and failure count keyed by replica name.
+        :rtype: dict
+        """
+        return {
+            replica.name: {"healthy": replica.healthy, "failures": replica.failures}
+            for replica in self.replicas
+        }
@@ -1,13 +1,18 @@
+import base64
+import binascii
+import json
+
 from fastapi import Depends, HTTPException
 from typing import List
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, extract
-from src.database.models import Contact, User
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, update, delete, case, func, literal, literal_column, or_, and_
+from src.database.models import Contact, User, birthday_key
 from src.schemas import ContactModel, ContactUpdate
+from src.services.contacts_cache import contacts_cache
 from datetime import datetime, timedelta
 
 
-async def create_contact(contact: ContactModel, user: User, db: Session):
+async def create_contact(contact: ContactModel, user: User, db: AsyncSession):
     """
     Create a new contact for the specific user.
 
@@ -16,7 +21,7 @@ async def create_contact(contact: ContactModel, user: User, db: Session):
     :param user: The user to create the contact for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The newly created contact.
     :rtype: Contact
     """
@@ -27,47 +32,181 @@ async def create_contact(contact: ContactModel, user: User, db: Session):
         phone=contact.phone,
         birthday=contact.birthday,
         notes=contact.notes,
-        user=user,
+        user_id=user.id,
     )
     db.add(db_contact)
-    db.commit()
-    db.refresh(db_contact)
+    await db.commit()
+    await contacts_cache.bump(user.id)
+    await db.refresh(db_contact)
     return db_contact
 
 
-async def read_contacts(db: Session, q: str = None, user = User):
+async def create_contacts(contacts: List[ContactModel], user: User, db: AsyncSession) -> int:
+    """
+    Create many contacts for the specific user with a single multi-row insert.
+
+    :param contacts: The validated contacts to be created.
+    :type contacts: List[ContactModel]
+    :param user: The user to create the contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The number of created contacts.
+    :rtype: int
+    """
+    if not contacts:
+        return 0
+    rows = [
+        {
+            **contact.model_dump(include=set(ContactModel.model_fields)),
+            "birthday_key": birthday_key(contact.birthday),
+            "user_id": user.id,
+        }
+        for contact in contacts
+    ]
+    await db.execute(insert(Contact), rows)
+    await db.commit()
+    await contacts_cache.bump(user.id)
+    return len(rows)
+
+
+def search_document():
+    """
+    The text expression searched by the ``q`` parameter.
+
+    It matches the expression of the ``ix_contacts_search_trgm`` trigram index on Postgres,
+    so the separators are rendered inline rather than as bound parameters.
+
+    :return: first_name, last_name and email joined with spaces.
+    :rtype: ColumnElement[str]
+    """
+    space = literal_column("' '")
+    return Contact.first_name + space + Contact.last_name + space + Contact.email
+
+
+def encode_cursor(contact: Contact, rank: float = None) -> str:
     """
-    Retrieve all contacts for the specific user, optionally filtered by a search query.
+    Build an opaque pagination cursor pointing right after the given contact.
+
+    :param contact: The last contact of the current page.
+    :type contact: Contact
+    :param rank: The search relevance of the contact, for ranked search pages. Defaults to None.
+    :type rank: float
+    :return: The URL-safe cursor string.
+    :rtype: str
+    """
+    position = {"id": contact.id}
+    if rank is not None:
+        position["rank"] = rank
+    payload = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """
+    Decode a pagination cursor produced by :func:`encode_cursor`.
+
+    :param cursor: The cursor received from the client.
+    :type cursor: str
+    :raises HTTPException: If the cursor is malformed.
+    :return: The decoded cursor position.
+    :rtype: dict
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(position.get("id"), int):
+            raise ValueError(cursor)
+        if not isinstance(position.get("rank", 0.0), (int, float)):
+            raise ValueError(cursor)
+        return position
+    except (binascii.Error, ValueError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def read_contacts(
+    db: AsyncSession,
+    q: str = None,
+    user = User,
+    limit: int = 50,
+    cursor: str = None,
+):
+    """
+    Retrieve a page of contacts for the specific user, optionally filtered by a search query.
+
+    Pages are fetched with keyset pagination on ``(user_id, id)``, so the cost of a page
+    does not depend on how deep into the address book it is. On Postgres the search is
+    served by a trigram index and ordered by relevance, elsewhere it falls back to a
+    plain ``ILIKE`` ordered by contact ID.
 
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :param q: The search query. Defaults to None.
     :type q: str
     :param user: The user to retrieve contacts for.
     :type user: User
-    :return: List of contacts matching the search query if provided or all contacts of the user, if query is None.
-    :rtype: List[Contact]
+    :param limit: The maximum number of contacts to return. Defaults to 50.
+    :type limit: int
+    :param cursor: The ``next_cursor`` of the previous page. Defaults to None.
+    :type cursor: str
+    :raises HTTPException: If the cursor is malformed.
+    :return: Contacts of the page and the cursor of the next page, None on the last page.
+    :rtype: dict
     """
+    position = decode_cursor(cursor) if cursor else None
+    ranked = bool(q) and db.get_bind().dialect.name == "postgresql"
+    rank = func.word_similarity(literal(q), search_document()) if ranked else None
+
+    stmt = select(Contact).where(Contact.user_id == user.id)
+    if ranked:
+        stmt = stmt.add_columns(rank)
     if q:
-        return (
-            db.query(Contact)
-            .filter(
-                and_(
-                    or_(
-                        Contact.first_name.ilike(f"%{q}%"),
-                        Contact.last_name.ilike(f"%{q}%"),
-                        Contact.email.ilike(f"%{q}%"),
-                    ),
-                    Contact.user_id == user.id,
-                )
+        stmt = stmt.where(search_document().icontains(q, autoescape=True))
+
+    if ranked:
+        if position:
+            last_rank = position.get("rank", 0.0)
+            stmt = stmt.where(
+                or_(rank < last_rank, and_(rank == last_rank, Contact.id > position["id"]))
             )
-            .all()
-        )
+        stmt = stmt.order_by(rank.desc(), Contact.id)
+    else:
+        if position:
+            stmt = stmt.where(Contact.id > position["id"])
+        stmt = stmt.order_by(Contact.id)
+
+    result = await db.execute(stmt.limit(limit + 1))
+    rows = result.all() if ranked else [(contact, None) for contact in result.scalars().all()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*rows[-1])
+    return {"items": [row[0] for row in rows], "next_cursor": next_cursor}
+
+
+async def stream_contacts(user: User, db: AsyncSession, batch_size: int = 1000):
+    """
+    Stream all contacts of the specific user from a server-side cursor.
 
-    return db.query(Contact).filter(Contact.user_id == user.id).all()
+    :param user: The user to retrieve contacts for.
+    :type user: User
+    :param db: The database session. It must stay open while the result is consumed.
+    :type db: AsyncSession
+    :param batch_size: The number of rows fetched from the cursor at a time. Defaults to 1000.
+    :type batch_size: int
+    :return: Contacts of the user ordered by ID.
+    :rtype: AsyncScalarResult[Contact]
+    """
+    result = await db.stream(
+        select(Contact)
+        .where(Contact.user_id == user.id)
+        .order_by(Contact.id)
+        .execution_options(yield_per=batch_size)
+    )
+    return result.scalars()
 
 
-async def find_contact(contact_id: int, user: User, db: Session):
+async def find_contact(contact_id: int, user: User, db: AsyncSession):
     """
     Retrieves a single contact with specified ID for the specific user.
 
@@ -76,16 +215,15 @@ async def find_contact(contact_id: int, user: User, db: Session):
     :param user: The user to retrieve contact for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :raises HTTPException: If the contact with the specified ID is not found.
     :return: The found contact.
     :rtype: Contact
     """
-    db_contact = (
-        db.query(Contact)
-        .filter(and_(Contact.user_id == user.id, Contact.id == contact_id))
-        .first()
+    result = await db.execute(
+        select(Contact).where(and_(Contact.user_id == user.id, Contact.id == contact_id))
     )
+    db_contact = result.scalar_one_or_none()
     if db_contact is None:
         raise HTTPException(
             status_code=404, detail=f"Contact with id: {contact_id} was not found"
@@ -94,11 +232,14 @@ async def find_contact(contact_id: int, user: User, db: Session):
 
 
 async def update_contact(
-    contact_id: int, user: User, contact: ContactUpdate, db: Session
+    contact_id: int, user: User, contact: ContactUpdate, db: AsyncSession
 ):
     """
     Update a specified contact's details for a specific user.
 
+    Only the fields that were set in ``contact`` are changed. The update is a single
+    ``UPDATE ... RETURNING`` statement, without loading the contact first.
+
     :param contact_id: The ID of the contact to update.
     :type contact_id: int
     :param user: The user to whom the contact belongs.
@@ -106,46 +247,35 @@ async def update_contact(
     :param contact: The updated contact details.
     :type contact: ContactUpdate
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :raises HTTPException: If the contact with the specified ID is not found.
     :return: The updated contact.
     :rtype: Contact
     """
-    db_contact = (
-        db.query(Contact)
-        .filter(and_(Contact.user_id == user.id, Contact.id == contact_id))
-        .first()
-    )
+    values = contact.model_dump(exclude_unset=True)
+    if not values:
+        return await find_contact(contact_id, user, db)
+    if "birthday" in values:
+        values["birthday_key"] = birthday_key(values["birthday"])
 
+    result = await db.execute(
+        update(Contact)
+        .where(and_(Contact.user_id == user.id, Contact.id == contact_id))
+        .values(**values)
+        .returning(Contact)
+        .execution_options(synchronize_session=False)
+    )
+    db_contact = result.scalar_one_or_none()
     if db_contact is None:
         raise HTTPException(
             status_code=404, detail=f"Contact with id: {contact_id} was not found"
         )
-
-    if contact.first_name != db_contact.first_name and contact.first_name != "string":
-        db_contact.first_name = contact.first_name
-
-    if contact.last_name != db_contact.last_name and contact.last_name != "string":
-        db_contact.last_name = contact.last_name
-
-    if contact.email != db_contact.email and contact.email != "user@example.com":
-        db_contact.email = contact.email
-
-    if contact.phone != db_contact.phone and contact.phone != "tel:+381-23-4567899":
-        db_contact.phone = contact.phone
-
-    if contact.birthday != db_contact.birthday and contact.birthday != datetime.today():
-        db_contact.birthday = contact.birthday
-
-    if contact.notes != db_contact.notes and contact.notes != "string":
-        db_contact.notes = contact.notes
-
-    db.commit()
-    db.refresh(db_contact)
+    await db.commit()
+    await contacts_cache.bump(user.id)
     return db_contact
 
 
-async def delete_contact(contact_id: int, user: User, db: Session):
+async def delete_contact(contact_id: int, user: User, db: AsyncSession):
     """
     Removes a single contact with the specified ID for a specific user.
 
@@ -154,56 +284,55 @@ async def delete_contact(contact_id: int, user: User, db: Session):
     :param user: The user to remove the contact for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :raises HTTPException: If the contact with the specified ID is not found.
     :return: A message confirming the deletion.
     :rtype: dict
     """
-    db_contact = (
-        db.query(Contact)
-        .filter(and_(Contact.user_id == user.id, Contact.id == contact_id))
-        .first()
+    result = await db.execute(
+        delete(Contact)
+        .where(and_(Contact.user_id == user.id, Contact.id == contact_id))
+        .returning(Contact.id)
+        .execution_options(synchronize_session=False)
     )
-    if db_contact is None:
+    if result.scalar_one_or_none() is None:
         raise HTTPException(
             status_code=404, detail=f"Contact with id: {contact_id} was not found"
         )
-    db.delete(db_contact)
-    db.commit()
+    await db.commit()
+    await contacts_cache.bump(user.id)
     return {"message": "Contact successfully deleted"}
 
 
-async def get_future_birthdays(user: User, db: Session):
+async def get_future_birthdays(user: User, db: AsyncSession, days: int = 7):
     """
-    Retrieve all contacts with birthdays within next 7 days for a specific user.
+    Retrieve all contacts with birthdays within next ``days`` days for a specific user.
+
+    The window is matched against the precomputed ``birthday_key`` (``month * 100 + day``)
+    with a single range, served by the ``(user_id, birthday_key)`` index. A window that
+    crosses New Year is split into the two ends of the key range.
 
     :param user: The user to retrieve the contacts for.
     :type user: User
     :param db: The database session.
-    :type db: Session
-    :return: Contacts with birthdays within next 7 days.
+    :type db: AsyncSession
+    :param days: The size of the window in days, today included. Defaults to 7.
+    :type days: int
+    :return: Contacts with birthdays within next ``days`` days, soonest first.
     :rtype: List[Contact]
     """
     today = datetime.now().date()
-    end_date = today + timedelta(days=7)
-
-    result = (
-        db.query(Contact)
-        .filter(
-            or_(
-                and_(
-                    extract("month", Contact.birthday) == today.month,
-                    extract("day", Contact.birthday) >= today.day,
-                    extract("day", Contact.birthday) <= end_date.day,
-                    Contact.user_id == user.id,
-                ),
-                and_(
-                    extract("month", Contact.birthday) == end_date.month,
-                    extract("day", Contact.birthday) <= end_date.day,
-                    Contact.user_id == user.id,
-                ),
-            )
-        )
-        .all()
+    end_date = today + timedelta(days=days)
+    start_key, end_key = birthday_key(today), birthday_key(end_date)
+
+    if end_date.year == today.year:
+        in_window = Contact.birthday_key.between(start_key, end_key)
+    else:
+        in_window = or_(Contact.birthday_key >= start_key, Contact.birthday_key <= end_key)
+
+    result = await db.execute(
+        select(Contact)
+        .where(Contact.user_id == user.id, in_window)
+        .order_by(case((Contact.birthday_key >= start_key, 0), else_=1), Contact.birthday_key)
     )
-    return result
+    return result.scalars().all()
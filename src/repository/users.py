@@ -1,30 +1,33 @@
 from libgravatar import Gravatar
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import User
 from src.schemas import UserModel
+from src.services.user_cache import user_cache
 
 
-async def get_user_by_email(email: str, db: Session) -> User:
+async def get_user_by_email(email: str, db: AsyncSession) -> User:
     """Retrive a user by email from the database.
     
     :param email: The email of the user to retrive.
     :type email: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The user with the specified email
     :rtype: User 
     """
-    return db.query(User).filter(User.email == email).first()
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalar_one_or_none()
 
 
-async def create_user(body: UserModel, db: Session) -> User:
+async def create_user(body: UserModel, db: AsyncSession) -> User:
     """Create a new user.
 
     :param body: The data for the new user to be created.
     :type body: UserModel
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The newly created user.
     :rtype: User
     """
@@ -36,43 +39,28 @@ async def create_user(body: UserModel, db: Session) -> User:
         print(e)
     new_user = User(**body.model_dump(), avatar=avatar)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 
-async def update_token(user: User, token: str | None, db: Session) -> None:
-    """
-    Update token for the specified user.
-
-    :param user: The user to update token for.
-    :type user: User
-    :param token: The refreshed token.
-    :type token: str | None
-    :param db: The database session.
-    :type db: Session
-    :return: None
-    """
-    user.refresh_token = token
-    db.commit()
-
-
-async def confirmed_email(email: str, bd: Session):
+async def confirmed_email(email: str, bd: AsyncSession):
     """
     Confirm user's email.
 
     :param email: The email to confirm.
     :type email: str
     :param bd: The database session.
-    :type bd: Session
+    :type bd: AsyncSession
     :return: None
     """
     user = await get_user_by_email(email, bd)
     user.confirmed = True
-    bd.commit()
+    await bd.commit()
+    await user_cache.write(user)
 
 
-async def update_avatar(email, url: str, db: Session):
+async def update_avatar(email, url: str, db: AsyncSession):
     """
     Update user's avatar url.
 
@@ -81,11 +69,12 @@ async def update_avatar(email, url: str, db: Session):
     :param url: The new avatar URL.
     :type url: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The updated user.
     :rtype: User
     """
     user = await get_user_by_email(email, db)
     user.avatar = url
-    db.commit()
+    await db.commit()
+    await user_cache.write(user)
     return user
@@ -1,40 +1,53 @@
+import logging
 from typing import List
 
-from fastapi import APIRouter, HTTPException, Depends, status, Security, BackgroundTasks, Request
+from fastapi import APIRouter, HTTPException, Depends, status, Security, Request
 from fastapi.security import (
     OAuth2PasswordRequestForm,
     HTTPAuthorizationCredentials,
     HTTPBearer,
 )
-from sqlalchemy.orm import Session
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.db import get_db
+from src.database.db import get_async_db
 from src.schemas import UserModel, UserResponse, TokenModel, RequestEmail
 from src.repository import users as repository_users
 from src.services.auth import auth_service
-from src.services.email import send_email
+from src.services.email import queue_confirmation_email
+from src.services.rate_limit import RateLimit
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 security = HTTPBearer()
 
+signup_limit = RateLimit("auth:signup", times=5, seconds=60)
+login_limit = RateLimit("auth:login", times=10, seconds=60)
+token_limit = RateLimit("auth:token", times=30, seconds=60)
+email_limit = RateLimit("auth:email", times=10, seconds=60)
+request_email_limit = RateLimit("auth:request_email", times=3, seconds=60)
+
 
 @router.post(
-    "/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED
+    "/signup",
+    response_model=UserResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(signup_limit)],
 )
-async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Request, db: Session = Depends(get_db)):
+async def signup(body: UserModel, request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Create a new user in database based on data validated by pydantic.
     Password is hashed and stored in database. 
-    An email for email address confirmetion is sent to the newly created users' email. 
+    An email for email address confirmetion is queued for the newly created users' email. 
+    If it cannot be queued the user is still created and can request the email again.
 
     :param body: The data for the new user to create.
     :type body: UserModel
-    :param background_tasks: Backgoung task to run.
-    :type background_tasks: BackgroundTasks
     :param request: The base url of the server.
     :type request: Request
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The created user.
     :rtype: UserResponse
     """
@@ -43,15 +56,22 @@ async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Re
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail="Account already exists"
         )
-    body.password = auth_service.get_password_hash(body.password)
+    body.password = await auth_service.get_password_hash(body.password)
     new_user = await repository_users.create_user(body, db)
-    background_tasks.add_task(send_email, new_user.email, new_user.username, request.base_url)
+    try:
+        await queue_confirmation_email(new_user.email, new_user.username, request.base_url)
+    except RedisError as err:
+        logger.warning("Queueing the confirmation email of %s failed: %s", new_user.email, err)
+        return {
+            "user": new_user,
+            "detail": "User successfully created. Request a confirmation email to confirm it.",
+        }
     return {"user": new_user, "detail": "User successfully created. Check your email for confirmation."}
 
 
-@router.post("/login", response_model=TokenModel)
+@router.post("/login", response_model=TokenModel, dependencies=[Depends(login_limit)])
 async def login(
-    body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+    body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)
 ):
     """
     User's authentication.
@@ -61,7 +81,7 @@ async def login(
     :param body: The login cridentials.
     :type body: OAuth2PasswordRequestForm
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The access token and refresh token.
     :rtypr: TokenModel 
     """
@@ -74,14 +94,13 @@ async def login(
     if not user.confirmed: 
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email is not confirmed")
 
-    if not auth_service.verify_password(body.password, user.password):
+    if not await auth_service.verify_password(body.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password"
         )
     # Generate JWT
-    access_token = await auth_service.create_access_token(data={"sub": user.email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
-    await repository_users.update_token(user, refresh_token, db)
+    access_token = await auth_service.create_access_token(data={"sub": user.email, "uid": user.id})
+    refresh_token = await auth_service.create_refresh_token(data={"sub": user.email, "uid": user.id})
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
@@ -89,34 +108,23 @@ async def login(
     }
 
 
-@router.get("/refresh_token", response_model=TokenModel)
-async def refresh_token(
-    credentials: HTTPAuthorizationCredentials = Security(security),
-    db: Session = Depends(get_db),
-):
+@router.get("/refresh_token", response_model=TokenModel, dependencies=[Depends(token_limit)])
+async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security)):
     """
     Refresh the access token.
     Provides a new pair of access and refresh tokens for the user.
+    The presented refresh token is used up; presenting it again revokes every token
+    issued from the same login.
 
     :param credentials: The HTTP authorization credential scontaining the refresh token.
     :type credentials: HTTPAuthorizationCredentials
-    :param db: The database session.
-    :type db: Session
     :return: A dictionary containing the new access token, refresh token and token type.
     :rtype: TokenModel
     """
-    token = credentials.credentials
-    email = await auth_service.decode_refresh_token(token)
-    user = await repository_users.get_user_by_email(email, db)
-    if user.refresh_token != token:
-        await repository_users.update_token(user, None, db)
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
-        )
-
-    access_token = await auth_service.create_access_token(data={"sub": email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": email})
-    await repository_users.update_token(user, refresh_token, db)
+    payload = await auth_service.rotate_refresh_token(credentials.credentials)
+    data = {claim: payload[claim] for claim in ("sub", "uid") if claim in payload}
+    access_token = await auth_service.create_access_token(data=data)
+    refresh_token = await auth_service.create_refresh_token(data=data, family=payload["fam"])
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
@@ -124,15 +132,39 @@ async def refresh_token(
     }
 
 
-@router.get("/confirmed_email/{token}")
-async def confirmed_email(token: str, db: Session = Depends(get_db)):
+@router.post("/logout", dependencies=[Depends(token_limit)])
+async def logout(
+    everywhere: bool = False,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+):
+    """
+    User's logout.
+    Revokes the refresh token family of the presented refresh token, so no token issued
+    from the same login can be refreshed any more. With ``everywhere`` every access token
+    of the user is invalidated as well.
+
+    :param everywhere: Whether to invalidate all access tokens of the user. Defaults to False.
+    :type everywhere: bool
+    :param credentials: The HTTP authorization credentials containing the refresh token.
+    :type credentials: HTTPAuthorizationCredentials
+    :return: A message confirming the logout.
+    :rtype: dict
+    """
+    payload = await auth_service.revoke_refresh_token(credentials.credentials)
+    if everywhere and "uid" in payload:
+        await auth_service.revoke_user_tokens(payload["uid"])
+    return {"message": "Logged out"}
+
+
+@router.get("/confirmed_email/{token}", dependencies=[Depends(email_limit)])
+async def confirmed_email(token: str, db: AsyncSession = Depends(get_async_db)):
     """
     User's email confirmation.
 
     :param token: The confirmation token.
     :type token: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: A message confirming the email. 
     :rtype: dict
     
@@ -148,24 +180,21 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
     return {"message": "Email is confirmed"}
 
 
-@router.post("/request_email")
+@router.post("/request_email", dependencies=[Depends(request_email_limit)])
 async def request_email(
     body: RequestEmail,
-    background_tasks: BackgroundTasks,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Email confirmation request.
 
     :param body: The email to be confirmed.
     :tupe body: RequestEmail
-    :param backgroud_tasks: Background task to run.
-    :type background_tasks: BackgroundTasks
     :param request: The base URL of the server.
     :type request: Request
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: A message instructing the user to check their email for confirmation.
     :rtype: dict
     """
@@ -174,7 +203,5 @@ async def request_email(
     if user.confirmed:
         return {"message": "Your email is already confirmed"}
     if user:
-        background_tasks.add_task(
-            send_email, user.email, user.username, request.base_url
-        )
+        await queue_confirmation_email(user.email, user.username, request.base_url)
     return {"message": "Check your email for confirmation."}
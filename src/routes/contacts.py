@@ -1,10 +1,21 @@
-from fastapi import APIRouter, Depends, status
-from fastapi_limiter.depends import RateLimiter
-from src.database.db import get_db
-from sqlalchemy.orm import Session
+from datetime import date
+
+from fastapi import APIRouter, Depends, File, Query, Request, UploadFile, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from src.database.db import (
+    get_async_db,
+    get_async_read_db,
+    get_async_read_sessionmaker,
+    get_async_sessionmaker,
+)
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from src.repository import contacts as repository_contacts
 from src.services.auth import auth_service
-from src.schemas import ContactModel, ContactUpdate, ContactResponse
+from src.services import contacts_io
+from src.services.contacts_cache import contacts_cache
+from src.services.rate_limit import UserRateLimit
+from src.schemas import ContactModel, ContactUpdate, ContactResponse, ContactPage, ImportReport
 from src.database.models import User
 from typing import List
 
@@ -12,12 +23,26 @@ from typing import List
 router = APIRouter(prefix="/contacts", tags=["contacts"])
 router_b = APIRouter(prefix="/contacts/birthdays", tags=["contacts"])
 
+list_limit = UserRateLimit("contacts:list", times=10, seconds=60)
+read_limit = UserRateLimit("contacts:read", times=60, seconds=60)
+write_limit = UserRateLimit("contacts:write", times=30, seconds=60)
+import_limit = UserRateLimit("contacts:import", times=5, seconds=60)
+export_limit = UserRateLimit("contacts:export", times=5, seconds=60)
+
+contact_page = TypeAdapter(ContactPage)
+contact_list = TypeAdapter(List[ContactResponse])
+
 
-@router.post("/", response_model=ContactResponse, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/",
+    response_model=ContactResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(write_limit)],
+)
 async def create_contact(
     contact: ContactModel,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(auth_service.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(auth_service.get_current_principal),
 ):
     """
     Create a new contact for the specific user.
@@ -25,7 +50,7 @@ async def create_contact(
     :param contact: The data for the contact to be created.
     :type contact: ContactModel
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The user to create the contact for.
     :type current_user: User
     :return: The newly created contact.
@@ -34,38 +59,119 @@ async def create_contact(
     return await repository_contacts.create_contact(contact, current_user, db)
 
 
+@router.post("/import", response_model=ImportReport, dependencies=[Depends(import_limit)])
+async def import_contacts(
+    file: UploadFile = File(),
+    format: str = Query(None, pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(auth_service.get_current_principal),
+):
+    """
+    Bulk import contacts from an uploaded CSV (with header) or NDJSON file.
+
+    :param file: The file with one contact per row.
+    :type file: UploadFile
+    :param format: ``csv`` or ``ndjson``. Detected from the upload when omitted.
+    :type format: str
+    :param db: The database session.
+    :type db: AsyncSession
+    :param current_user: The user to import the contacts for.
+    :type current_user: User
+    :return: Number of imported and failed rows with the per-row errors.
+    :rtype: ImportReport
+    """
+    fmt = contacts_io.detect_format(file, format)
+    return await contacts_io.import_contacts(file, fmt, current_user, db)
+
+
 @router.get(
     "/",
-    response_model=List[ContactResponse],
+    response_model=ContactPage,
     description="No more that 10 requests per minute",
-    dependencies=[Depends(RateLimiter(times=10, seconds=60))],
+    dependencies=[Depends(list_limit)],
 )
 async def read_contacts(
+    request: Request,
     q: str = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(auth_service.get_current_user),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str = None,
+    session_factory: async_sessionmaker = Depends(get_async_sessionmaker),
+    current_user: User = Depends(auth_service.get_current_principal),
 ):
     """
-    Retrieve all contacts for the specific user, optionally filtered by a search query.
+    Retrieve a page of contacts for the specific user, optionally filtered by a search query.
+    Responses are cached per contacts version and carry an ETag; a matching
+    ``If-None-Match`` is answered with ``304 Not Modified``. Misses are read from the
+    primary, which the contacts version is current with, so a lagging replica never
+    fills the cache with rows older than the version.
 
+    :param request: The incoming request.
+    :type request: Request
     :param q: The search query. Defaults to None.
     :type q: str
-    :param db: The database session.
-    :type db: Session
+    :param limit: The maximum number of contacts to return. Defaults to 50.
+    :type limit: int
+    :param cursor: The ``next_cursor`` of the previous page. Defaults to None.
+    :type cursor: str
+    :param session_factory: Opens a primary database session on a cache miss.
+    :type session_factory: async_sessionmaker
     :param user: The user to retrieve contacts for.
     :type user: User
-    :return: List of contacts matching the search query if provided or all contacts of the user, if query is None.
-    :rtype: List[Contact]
+    :return: Contacts of the page and the cursor of the next page.
+    :rtype: ContactPage
+    """
+    async def produce():
+        async with session_factory() as db:
+            return await repository_contacts.read_contacts(db, q, current_user, limit, cursor)
+
+    return await contacts_cache.respond(
+        request,
+        current_user.id,
+        "page",
+        {"q": q, "limit": limit, "cursor": cursor},
+        contact_page,
+        produce,
+    )
+
+
+@router.get("/export", response_class=StreamingResponse, dependencies=[Depends(export_limit)])
+async def export_contacts(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    session_factory: async_sessionmaker = Depends(get_async_read_sessionmaker),
+    current_user: User = Depends(auth_service.get_current_principal),
+):
+    """
+    Export all contacts of the specific user as a streamed CSV or NDJSON file.
+
+    :param format: ``csv`` or ``ndjson``. Defaults to ``csv``.
+    :type format: str
+    :param gzip: Whether to gzip the file. Defaults to False.
+    :type gzip: bool
+    :param session_factory: Factory of the session that streams the contacts.
+    :type session_factory: async_sessionmaker
+    :param current_user: The user to export contacts for.
+    :type current_user: User
+    :return: The streamed file.
+    :rtype: StreamingResponse
     """
-    contacts = await repository_contacts.read_contacts(db, q, current_user)
-    return contacts
+    filename = f"contacts.{format}" + (".gz" if gzip else "")
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    media_type = contacts_io.EXPORT_MEDIA_TYPES[format]
+    if gzip:
+        media_type = "application/gzip"
+    return StreamingResponse(
+        contacts_io.export_contacts(session_factory, current_user, format, gzip),
+        media_type=media_type,
+        headers=headers,
+    )
 
 
-@router.get("/{contact_id}", response_model=ContactResponse)
+@router.get("/{contact_id}", response_model=ContactResponse, dependencies=[Depends(read_limit)])
 async def find_contact(
     contact_id: int, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(auth_service.get_current_user),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(auth_service.get_current_principal),
 ):
     """
     Retrieves a single contact with specified ID for the specific user.
@@ -73,7 +179,7 @@ async def find_contact(
     :param contact_id: The ID of the contact to retrieve.
     :type contact_id: int
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The user to retrieve contact for.
     :type current_user: User
     :raises HTTPException: If the contact with the specified ID is not found.
@@ -83,23 +189,25 @@ async def find_contact(
     return contact
 
 
-@router.put("/{contact_id}", response_model=ContactResponse)
+@router.put("/{contact_id}", response_model=ContactResponse, dependencies=[Depends(write_limit)])
+@router.patch("/{contact_id}", response_model=ContactResponse, dependencies=[Depends(write_limit)])
 async def update_contact(
     contact_id: int,
     contact: ContactUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(auth_service.get_current_user), 
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(auth_service.get_current_principal), 
     
 ):
     """
     Update a specified contact's details for a specific user.
+    Only the fields present in the request body are changed.
 
     :param contact_id: The ID of the contact to update.
     :type contact_id: int
     :param contact: The updated contact details.
     :type contact: ContactUpdate
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The user to whom the contact belongs.
     :type current_user: User
     :raises HTTPException: If the contact with the specified ID is not found.
@@ -110,11 +218,11 @@ async def update_contact(
     return contact
 
 
-@router.delete("/{contact_id}")
+@router.delete("/{contact_id}", dependencies=[Depends(write_limit)])
 async def delete_contact(
     contact_id: int,
-    current_user: User = Depends(auth_service.get_current_user), 
-    db: Session = Depends(get_db)
+    current_user: User = Depends(auth_service.get_current_principal), 
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Removes a single contact with the specified ID for a specific user.
@@ -124,7 +232,7 @@ async def delete_contact(
     :param current_user: The user to remove the contact for.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :raises HTTPException: If the contact with the specified ID is not found.
     :return: A message confirming the deletion.
     :rtype: dict
@@ -133,20 +241,38 @@ async def delete_contact(
     return contact
 
 
-@router_b.get("/", response_model=List[ContactResponse])
+@router_b.get("/", response_model=List[ContactResponse], dependencies=[Depends(read_limit)])
 async def get_future_birthdays(
-    current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    days: int = Query(7, ge=1, le=365),
+    current_user: User = Depends(auth_service.get_current_principal),
+    session_factory: async_sessionmaker = Depends(get_async_sessionmaker),
 ):
     """
-    Retrieve all contacts with birthdays within next 7 days for a specific user.
+    Retrieve all contacts with birthdays within next ``days`` days for a specific user.
+    Cached and revalidated like ``read_contacts``, misses included; the window moves
+    daily, so the date is part of the cache key.
 
+    :param request: The incoming request.
+    :type request: Request
+    :param days: The size of the window in days, from 1 to 365. Defaults to 7.
+    :type days: int
     :param current_user: The user to retrieve the contacts for.
     :type current_user: User
-    :param db: The database session.
-    :type db: Session
-    :return: Contacts with birthdays within next 7 days.
+    :param session_factory: Opens a primary database session on a cache miss.
+    :type session_factory: async_sessionmaker
+    :return: Contacts with birthdays within next ``days`` days.
     :rtype: List[ContactResponse]
     """
-    contacts = await repository_contacts.get_future_birthdays(current_user, db)
-    return contacts
+    async def produce():
+        async with session_factory() as db:
+            return await repository_contacts.get_future_birthdays(current_user, db, days)
+
+    return await contacts_cache.respond(
+        request,
+        current_user.id,
+        "birthdays",
+        {"days": days, "today": date.today()},
+        contact_list,
+        produce,
+    )
@@ -0,0 +1,53 @@
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+
+from src.conf.config import settings
+from src.services.metrics import registry
+
+
+async def verify_internal_token(x_internal_token: str = Header(default="")):
+    """
+    Allow only callers presenting the internal token in the ``X-Internal-Token`` header.
+
+    The internal endpoints are disabled, and answer 404, while no token is configured.
+
+    :param x_internal_token: The token presented by the caller.
+    :type x_internal_token: str
+    :raises HTTPException: 404 if no token is configured, 403 if the token is wrong.
+    """
+    if not settings.internal_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not secrets.compare_digest(x_internal_token.encode(), settings.internal_token.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["internal"],
+    include_in_schema=False,
+    dependencies=[Depends(verify_internal_token)],
+)
+
+
+@router.get("/pool")
+async def read_pool_stats():
+    """
+    Report database connection pool usage and checkout wait statistics.
+
+    :return: Pool snapshots of the async and sync engines.
+    :rtype: dict
+    """
+    metrics = registry.collect()
+    return {"db_pool": metrics["db_pool"], "db_pool_sync": metrics["db_pool_sync"]}
+
+
+@router.get("/metrics")
+async def read_metrics():
+    """
+    Report every registered metrics source.
+
+    :return: Snapshots keyed by source name.
+    :rtype: dict
+    """
+    return registry.collect()
@@ -1,13 +1,8 @@
 from fastapi import APIRouter, Depends, status, UploadFile, File
-from sqlalchemy.orm import Session
-import cloudinary
-import cloudinary.uploader
 
-from src.database.db import get_db
 from src.database.models import User
-from src.repository import users as repository_users
 from src.services.auth import auth_service
-from src.conf.config import settings
+from src.services.avatars import avatar_pipeline
 from src.schemas import UserDb
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -26,36 +21,22 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
     return current_user
 
 
-@router.patch("/avatar/", response_model=UserDb)
+@router.patch("/avatar/", status_code=status.HTTP_202_ACCEPTED)
 async def update_avatar_user(
     file: UploadFile = File(),
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
 ):
     """
     Update the avatar of the current user.
 
+    The image is validated and queued; the avatar changes once a worker has stored it.
+
     :param file: The image file for the new avatar.
     :type file: UploadFile
     :param current_user: The current authenticated user.
     :type current_user: User
-    :param db: The database session.
-    :type db: Session
-    :return: The updated user with the new avatar.
-    :rtype: UserDb
+    :return: A message confirming the avatar update was accepted.
+    :rtype: dict
     """
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True,
-    )
-
-    r = cloudinary.uploader.upload(
-        file.file, public_id=f"RestApiApp/{current_user.username}", overwrite=True
-    )
-    src_url = cloudinary.CloudinaryImage(
-        f"RestApiApp/{current_user.username}"
-    ).build_url(width=250, height=250, crop="fill", version=r.get("version"))
-    user = await repository_users.update_avatar(current_user.email, src_url, db)
-    return user
+    await avatar_pipeline.accept(file, current_user)
+    return {"message": "Avatar update accepted"}
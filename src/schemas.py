@@ -1,4 +1,6 @@
-from pydantic import BaseModel, EmailStr, Field
+from typing import List, Optional
+
+from pydantic import BaseModel, EmailStr, Field, field_validator
 from pydantic_extra_types.phone_numbers import PhoneNumber
 from datetime import datetime, date
 
@@ -10,6 +12,14 @@ class ContactModel(BaseModel):
     birthday: date = None
     notes: str = None
 
+    @field_validator("phone")
+    @classmethod
+    def phone_fits_column(cls, phone: PhoneNumber) -> PhoneNumber:
+        # Checked on the formatted number, which is what gets stored
+        if phone is not None and len(phone) > 20:
+            raise ValueError(f"Formatted phone number {phone} is longer than 20 characters")
+        return phone
+
 
 class ContactUpdate(ContactModel):
     pass
@@ -22,12 +32,37 @@ class ContactResponse(ContactModel):
     email: EmailStr
     phone: PhoneNumber
     birthday: date 
-    notes: str
+    notes: Optional[str] = None
 
     class Config:
         from_attributes = True
 
 
+class ContactImport(ContactModel):
+    first_name: str = Field(max_length=20)
+    last_name: str = Field(max_length=20)
+    email: EmailStr = Field(max_length=40)
+    birthday: date
+    notes: Optional[str] = Field(None, max_length=250)
+
+
+class ImportRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+
+class ImportReport(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportRowError]
+    errors_truncated: bool = False
+
+
+class ContactPage(BaseModel):
+    items: List[ContactResponse]
+    next_cursor: Optional[str] = None
+
+
 class UserModel(BaseModel):
     username: str = Field(min_lengs = 5, max_length = 16)
     email: EmailStr = None
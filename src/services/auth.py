@@ -1,32 +1,41 @@
 from typing import Optional
-import pickle
-import redis
+from uuid import uuid4
 
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.db import get_db
+from src.database.db import get_async_db
+from src.database.models import User
 from src.repository import users as repository_users
 from src.conf.config import settings
+from src.services.hashing import password_hasher
+from src.services.refresh_tokens import refresh_token_store
+from src.services.token_cache import token_cache
+from src.services.token_versions import token_versions
+from src.services.user_cache import user_cache
 
 
 class Auth:
     """
     Class for authentication and authorization operations.
     """
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    password_hasher = password_hasher
     SECRET_KEY = settings.secret_key
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-    r = redis.Redis(host = settings.redis_host, port=settings.redis_port, db=0)
+    user_cache = user_cache
+    token_cache = token_cache
+    refresh_tokens = refresh_token_store
+    token_versions = token_versions
+    USER_CLAIMS = settings.access_token_user_claims
 
-    def verify_password(self, plain_password, hashed_password):
+    async def verify_password(self, plain_password, hashed_password):
         """
         Verify if the plain password matches the hashed password.
+        The check runs in the password hashing executor, off the event loop.
 
         :param plain_password: The plain password.
         :type plain_password: str
@@ -35,24 +44,27 @@ class Auth:
         :return: True if the passwords match, False otherwise.
         :rtype: bool
         """
-        return self.pwd_context.verify(plain_password, hashed_password)
+        return await self.password_hasher.verify(plain_password, hashed_password)
 
-    def get_password_hash(self, password: str):
+    async def get_password_hash(self, password: str):
         """
         Generate hashed password of the provided password.
+        Hashing runs in the password hashing executor, off the event loop.
 
         :param password: The password to hash.
         :type password: str
         :return: The hashed password.
         :rtype: str
         """
-        return self.pwd_context.hash(password)
+        return await self.password_hasher.hash(password)
 
     async def create_access_token(
         self, data: dict, expires_delta: Optional[float] = None
     ):
         """
         Create an access token.
+        If ``data`` has the user's ID under ``uid``, the token carries it together with the
+        user's token version, so ``get_current_principal`` can trust it without a lookup.
 
         :param data: The data to encode into the token.
         :type data: dict
@@ -69,35 +81,53 @@ class Auth:
         to_encode.update(
             {"iat": datetime.utcnow(), "exp": expire, "scope": "access_token"}
         )
+        uid = to_encode.pop("uid", None)
+        if self.USER_CLAIMS and uid is not None:
+            version = await self.token_versions.get(uid)
+            if version is not None:
+                to_encode.update({"uid": uid, "ver": version})
         encoded_access_token = jwt.encode(
             to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM
         )
         return encoded_access_token
 
     async def create_refresh_token(
-        self, data: dict, expires_delta: Optional[float] = None
+        self, data: dict, expires_delta: Optional[float] = None, family: Optional[str] = None
     ):
         """
-        Create a refresh token.
+        Create a refresh token and record it in the refresh token store.
+        Each token gets its own ID; tokens issued on refresh stay in the family of the
+        token they replace, a new family is started otherwise.
 
         :param data: The data to encode into the token.
         :type data: dict
         :param expires_delta: The expiration delta in seconds.
         :type expires_delta: Optional[float]
+        :param family: The token family, None to start a new one.
+        :type family: Optional[str]
         :return: The encoded refresh token.
         :rtype: str
         """
         to_encode = data.copy()
-        if expires_delta:
-            expire = datetime.utcnow() + timedelta(seconds=expires_delta)
-        else:
-            expire = datetime.utcnow() + timedelta(days=7)
+        if not expires_delta:
+            expires_delta = timedelta(days=7).total_seconds()
+        expire = datetime.utcnow() + timedelta(seconds=expires_delta)
+        jti = uuid4().hex
+        family = family or uuid4().hex
         to_encode.update(
-            {"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token"}
+            {
+                "iat": datetime.utcnow(),
+                "exp": expire,
+                "scope": "refresh_token",
+                "jti": jti,
+                "fam": family,
+            }
         )
         encoded_refresh_token = jwt.encode(
             to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM
         )
+        if expires_delta > 0:
+            await self.refresh_tokens.issue(jti, family, to_encode["sub"], int(expires_delta))
         return encoded_refresh_token
 
     def create_email_token(self, data: dict):
@@ -121,67 +151,179 @@ class Auth:
 
         :param refresh_token: The refresh token to decode.
         :type refresh_token: str
-        :return: The decoded email.
-        :rtype: str
+        :return: The decoded claims.
+        :rtype: dict
         """
         try:
             payload = jwt.decode(
                 refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM]
             )
-            if payload["scope"] == "refresh_token":
-                email = payload["sub"]
-                return email
+        except JWTError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+            )
+        if payload.get("scope") != "refresh_token":
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid scope for token",
             )
+        if not all(payload.get(claim) for claim in ("sub", "jti", "fam")):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid refresh token",
+            )
+        return payload
+
+    async def rotate_refresh_token(self, refresh_token: str):
+        """
+        Use up a refresh token so a new one can be issued in its place.
+        A token that was already used revokes its whole family.
+
+        :param refresh_token: The refresh token to use.
+        :type refresh_token: str
+        :raises HTTPException: If the token is invalid, reused or its family was revoked.
+        :return: The decoded claims.
+        :rtype: dict
+        """
+        payload = await self.decode_refresh_token(refresh_token)
+        if not await self.refresh_tokens.consume(payload["jti"], payload["fam"]):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
+            )
+        return payload
+
+    async def revoke_refresh_token(self, refresh_token: str):
+        """
+        Revoke the family of a refresh token, logging out every session started with it.
+
+        :param refresh_token: The refresh token.
+        :type refresh_token: str
+        :return: The decoded claims.
+        :rtype: dict
+        """
+        payload = await self.decode_refresh_token(refresh_token)
+        await self.refresh_tokens.revoke_family(payload["fam"])
+        return payload
+
+    async def decode_access_token(self, token: str) -> dict:
+        """
+        Decode and verify an access token.
+        Verified claims are cached until the token expires, so repeated requests with the
+        same token skip signature verification. Tokens stamped with an outdated token
+        version are rejected.
+
+        :param token: The access token.
+        :type token: str
+        :raises HTTPException: If the token is invalid, expired, revoked or of another scope.
+        :return: The verified claims.
+        :rtype: dict
+        """
+        claims = self.token_cache.get(token)
+        if claims is not None:
+            await self.check_token_version(claims)
+            return claims
+
+        credentials_exception = HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+        try:
+            # Decode JWT
+            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
         except JWTError:
+            raise credentials_exception
+        if payload.get("scope") != "access_token" or payload.get("sub") is None:
+            raise credentials_exception
+        await self.check_token_version(payload)
+        self.token_cache.set(token, payload)
+        return payload
+
+    async def check_token_version(self, claims: dict):
+        """
+        Reject an access token stamped with an outdated token version.
+
+        :param claims: The verified claims.
+        :type claims: dict
+        :raises HTTPException: 401 if the version is outdated, 503 if it cannot be checked.
+        """
+        if "ver" not in claims:
+            return
+        version = await self.token_versions.get(claims["uid"])
+        if version is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Could not validate credentials, try again later",
+                headers={"Retry-After": "1"},
+            )
+        if claims["ver"] != version:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials",
+                headers={"WWW-Authenticate": "Bearer"},
             )
 
+    async def revoke_user_tokens(self, user_id: int):
+        """
+        Invalidate every access token of a user that carries a token version.
+
+        :param user_id: The user's ID.
+        :type user_id: int
+        """
+        await self.token_versions.bump(user_id)
+
     async def get_current_user(
-        self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+        self,
+        token: str = Depends(oauth2_scheme),
+        db: AsyncSession = Depends(get_async_db),
     ):
         """
         Get the current authenticated user.
+        Concurrent cache misses for the same user share a single database load.
 
         :param token: The authentication token.
         :type token: str
         :param db: The database session.
-        :type db: Session
+        :type db: AsyncSession
         :return: The current authenticated user.
         :rtype: User
         """
-        credentials_exception = HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
+        email = (await self.decode_access_token(token))["sub"]
+        user = await self.user_cache.get_or_load(
+            email, lambda: repository_users.get_user_by_email(email, db)
         )
-
-        try:
-            # Decode JWT
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
-            if payload["scope"] == "access_token":
-                email = payload["sub"]
-                if email is None:
-                    raise credentials_exception
-            else:
-                raise credentials_exception
-        except JWTError as e:
-            raise credentials_exception
-        user = self.r.get(f"user:{email}")
         if user is None:
-            user = await repository_users.get_user_by_email(email, db)
-            if user is None:
-                raise credentials_exception
-            self.r.set(f"user:{email}", pickle.dumps(user))
-            self.r.expire(f"user:{email}", 900)
-        else: 
-            user = pickle.loads(user)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
         return user
 
+    async def get_current_principal(
+        self,
+        token: str = Depends(oauth2_scheme),
+        db: AsyncSession = Depends(get_async_db),
+    ):
+        """
+        Get the current authenticated user as far as the access token tells.
+        Tokens with user claims are trusted without any cache or database access; the
+        returned user has only ``id`` and ``email`` set. Other tokens fall back to
+        ``get_current_user``.
+
+        :param token: The authentication token.
+        :type token: str
+        :param db: The database session, used only by the fallback.
+        :type db: AsyncSession
+        :return: The current authenticated user.
+        :rtype: User
+        """
+        claims = await self.decode_access_token(token)
+        if "ver" not in claims:
+            return await self.get_current_user(token, db)
+        return User(id=claims["uid"], email=claims["sub"])
+
     async def get_email_from_token(self, token: str): 
         """
         Get the email from the token.
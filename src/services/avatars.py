@@ -0,0 +1,490 @@
+import asyncio
+import glob
+import hashlib
+import io
+import logging
+import mimetypes
+import os
+import re
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Iterable
+
+import cloudinary
+import cloudinary.uploader
+from fastapi import HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from PIL import ExifTags, Image, UnidentifiedImageError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.conf.config import settings
+from src.database.db import AsyncDBSession
+from src.database.models import User
+from src.repository import users as repository_users
+from src.services.metrics import registry
+from src.services.outbox import Outbox, avatar_outbox
+
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Leading bytes of the accepted image formats
+SIGNATURES = {
+    "image/jpeg": (b"\xff\xd8\xff",),
+    "image/png": (b"\x89PNG\r\n\x1a\n",),
+    "image/gif": (b"GIF87a", b"GIF89a"),
+    "image/webp": (b"RIFF",),
+}
+
+
+def sniff(head: bytes, content_type: str) -> bool:
+    """
+    Check that the first bytes of a file match its declared image type.
+
+    :param head: The first bytes of the file.
+    :type head: bytes
+    :param content_type: The declared content type.
+    :type content_type: str
+    :return: Whether the bytes match the type.
+    :rtype: bool
+    """
+    if not head.startswith(SIGNATURES.get(content_type, ())):
+        return False
+    return content_type != "image/webp" or head[8:12] == b"WEBP"
+
+
+# EXIF orientation to the transposition that displays the image upright
+ORIENTATIONS = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+class InvalidAvatar(ValueError):
+    """
+    The uploaded file cannot be decoded as an image of an acceptable size.
+    """
+
+
+def prepare_avatar(
+    source: Path, size: int, quality: int = 85, max_pixels: int = 40000000
+) -> bytes:
+    """
+    Decode an image, crop it to a centred square, scale it to ``size`` pixels and
+    re-encode it as JPEG.
+
+    Memory stays bounded by the decoded image: a JPEG is decoded directly at the smallest
+    1/2, 1/4 or 1/8 scale that still covers the target, the crop and the scaling happen
+    in a single resize, and the EXIF orientation is applied to the small result, which is
+    equivalent for a centred square crop.
+
+    :param source: The uploaded image.
+    :type source: Path
+    :param size: The width and height of the avatar.
+    :type size: int
+    :param quality: The JPEG quality.
+    :type quality: int
+    :param max_pixels: The largest accepted image, in pixels.
+    :type max_pixels: int
+    :raises InvalidAvatar: If the file is not a supported image or is too large.
+    :return: The encoded avatar.
+    :rtype: bytes
+    """
+    try:
+        with Image.open(source) as image:
+            if image.width * image.height > max_pixels:
+                raise InvalidAvatar(f"Image of {image.width}x{image.height} pixels is too large")
+            image.draft("RGB", (size, size))
+            orientation = image.getexif().get(ExifTags.Base.Orientation)
+            if image.mode not in ("RGB", "RGBA", "L", "LA"):
+                has_alpha = image.mode in ("PA", "RGBa", "La") or "transparency" in image.info
+                image = image.convert("RGBA" if has_alpha else "RGB")
+            width, height = image.size
+            side = min(width, height)
+            left, top = (width - side) / 2, (height - side) / 2
+            avatar = image.resize(
+                (size, size),
+                Image.Resampling.LANCZOS,
+                box=(left, top, left + side, top + side),
+                reducing_gap=3.0,
+            )
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as err:
+        raise InvalidAvatar(str(err)) from err
+
+    if orientation in ORIENTATIONS:
+        avatar = avatar.transpose(ORIENTATIONS[orientation])
+    if avatar.mode in ("RGBA", "LA"):
+        background = Image.new("RGB", avatar.size, "white")
+        background.paste(avatar, mask=avatar.getchannel("A"))
+        avatar = background
+    elif avatar.mode != "RGB":
+        avatar = avatar.convert("RGB")
+    buffer = io.BytesIO()
+    avatar.save(buffer, "JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+class AvatarStorage(ABC):
+    """
+    Where avatar images are stored. :meth:`save` returns the URL stored on the user.
+    """
+
+    @abstractmethod
+    async def save(self, key: str, path: Path, content_type: str) -> str:
+        """
+        Store an avatar image, replacing the previous one with the same key.
+
+        :param key: The avatar key, built from the user ID.
+        :type key: str
+        :param path: The image file.
+        :type path: Path
+        :param content_type: The image content type.
+        :type content_type: str
+        :return: The avatar URL.
+        :rtype: str
+        """
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """
+        Delete a stored avatar image.
+
+        :param key: The avatar key.
+        :type key: str
+        """
+
+
+class CloudinaryStorage(AvatarStorage):
+    """
+    Stores avatars on Cloudinary.
+
+    The client is configured once. The Cloudinary SDK is synchronous, so uploads run in a
+    dedicated thread pool and never block the event loop.
+    """
+
+    def __init__(
+        self,
+        cloud_name: str,
+        api_key: str,
+        api_secret: str,
+        folder: str = "RestApiApp",
+        workers: int = 4,
+    ):
+        cloudinary.config(
+            cloud_name=cloud_name, api_key=api_key, api_secret=api_secret, secure=True
+        )
+        self.folder = folder
+        self.workers = workers
+        self._executor: Executor | None = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="avatar-upload"
+            )
+        return self._executor
+
+    async def save(self, key: str, path: Path, content_type: str) -> str:
+        public_id = f"{self.folder}/{key}"
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            self.executor,
+            partial(cloudinary.uploader.upload, str(path), public_id=public_id, overwrite=True),
+        )
+        return cloudinary.CloudinaryImage(public_id).build_url(version=result.get("version"))
+
+    async def delete(self, key: str):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self.executor, partial(cloudinary.uploader.destroy, f"{self.folder}/{key}")
+        )
+
+
+class LocalStorage(AvatarStorage):
+    """
+    Stores avatars in a local directory served under ``base_url``; for development and tests.
+    """
+
+    def __init__(self, root: Path, base_url: str):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    def _path(self, name: str) -> Path:
+        # Keys must name a file directly inside root
+        root = self.root.resolve()
+        path = (root / name).resolve()
+        if path.parent != root:
+            raise ValueError(f"Avatar key '{name}' points outside {self.root}")
+        return path
+
+    def _copy(self, source: Path, name: str):
+        path = self._path(name)
+        self.root.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(source, path)
+
+    def _delete(self, key: str):
+        self._path(key)
+        for path in self.root.glob(f"{glob.escape(key)}.*"):
+            path.unlink(missing_ok=True)
+
+    async def save(self, key: str, path: Path, content_type: str) -> str:
+        name = f"{key}{mimetypes.guess_extension(content_type) or ''}"
+        await run_in_threadpool(self._copy, path, name)
+        return f"{self.base_url}/{name}"
+
+    async def delete(self, key: str):
+        await run_in_threadpool(self._delete, key)
+
+
+def create_storage(kind: str) -> AvatarStorage:
+    """
+    Create the configured avatar storage.
+
+    :param kind: ``cloudinary`` or ``local``.
+    :type kind: str
+    :return: The storage backend.
+    :rtype: AvatarStorage
+    """
+    if kind == "cloudinary":
+        return CloudinaryStorage(
+            settings.cloudinary_name,
+            settings.cloudinary_api_key,
+            settings.cloudinary_api_secret,
+            workers=settings.avatar_upload_workers,
+        )
+    if kind == "local":
+        return LocalStorage(Path(settings.avatar_local_dir), settings.avatar_local_url)
+    raise ValueError(f"Unknown avatar storage '{kind}'")
+
+
+class AvatarPipeline:
+    """
+    Avatar updates, accepted by the API and stored by the worker.
+
+    :meth:`accept` validates the upload while copying it in chunks to the spool directory,
+    which must be shared with the workers, and queues a job in the avatar outbox. The
+    worker runs :meth:`process`: it scales the image down to the avatar size, stores it
+    and updates the user in sessions of its own, outside of any request.
+
+    Stored avatars are keyed by the hash of their content, so an upload that produces the
+    current avatar again is not stored at all.
+    """
+
+    def __init__(
+        self,
+        storage: AvatarStorage,
+        outbox: Outbox,
+        spool_dir: Path,
+        max_size: int,
+        content_types: Iterable[str],
+        size: int = 250,
+        quality: int = 85,
+        max_pixels: int = 40000000,
+        session_factory: async_sessionmaker = AsyncDBSession,
+    ):
+        self.storage = storage
+        self.outbox = outbox
+        self.spool_dir = Path(spool_dir)
+        self.max_size = max_size
+        self.content_types = frozenset(content_types)
+        self.size = size
+        self.quality = quality
+        self.max_pixels = max_pixels
+        self.session_factory = session_factory
+        self.stored = 0
+        self.unchanged = 0
+        self.rejected = 0
+
+    async def spool(self, file: UploadFile, content_type: str) -> Path:
+        """
+        Copy an upload to the spool directory, checking its size and leading bytes.
+
+        :param file: The uploaded image.
+        :type file: UploadFile
+        :param content_type: The declared content type.
+        :type content_type: str
+        :raises HTTPException: 415 if the bytes are not of the declared type, 413 if the
+            file is larger than ``max_size``.
+        :return: The spooled file.
+        :rtype: Path
+        """
+        await run_in_threadpool(self.spool_dir.mkdir, parents=True, exist_ok=True)
+        path = self.spool_dir / uuid.uuid4().hex
+        target = await run_in_threadpool(open, path, "wb")
+        try:
+            size = 0
+            while chunk := await file.read(CHUNK_SIZE):
+                if size == 0 and not sniff(chunk, content_type):
+                    raise HTTPException(
+                        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                        detail="The file is not a valid image",
+                    )
+                size += len(chunk)
+                if size > self.max_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"The avatar must not exceed {self.max_size} bytes",
+                    )
+                await run_in_threadpool(target.write, chunk)
+            if size == 0:
+                raise HTTPException(
+                    status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                    detail="The file is not a valid image",
+                )
+        except BaseException:
+            target.close()
+            path.unlink(missing_ok=True)
+            raise
+        await run_in_threadpool(target.close)
+        return path
+
+    async def accept(self, file: UploadFile, user: User) -> str:
+        """
+        Validate and spool an uploaded avatar, then queue it for storage.
+
+        :param file: The uploaded image.
+        :type file: UploadFile
+        :param user: The user whose avatar changes.
+        :type user: User
+        :raises HTTPException: 415 for an unsupported or invalid image, 413 if too large.
+        :return: The outbox entry ID.
+        :rtype: str
+        """
+        content_type = (file.content_type or "").split(";")[0].strip().lower()
+        if content_type not in self.content_types:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail=f"Upload one of: {', '.join(sorted(self.content_types))}",
+            )
+        path = await self.spool(file, content_type)
+        try:
+            return await self.outbox.enqueue(
+                "update_avatar",
+                email=user.email,
+                key=str(user.id),
+                path=str(path),
+                content_type=content_type,
+            )
+        except BaseException:
+            path.unlink(missing_ok=True)
+            raise
+
+    @staticmethod
+    def content_key(key: str, avatar: bytes) -> str:
+        """
+        Build the storage key of an avatar from the user's key and the avatar content.
+
+        :param key: The user's avatar key.
+        :type key: str
+        :param avatar: The encoded avatar.
+        :type avatar: bytes
+        :return: The content-addressed storage key.
+        :rtype: str
+        """
+        return f"{key}-{hashlib.sha256(avatar).hexdigest()[:32]}"
+
+    @staticmethod
+    def stored_key(key: str, url: str | None) -> str | None:
+        """
+        Find the content-addressed storage key in an avatar URL.
+
+        :param key: The user's avatar key.
+        :type key: str
+        :param url: The avatar URL.
+        :type url: str | None
+        :return: The storage key, None for avatars not stored by this pipeline.
+        :rtype: str | None
+        """
+        match = re.search(rf"(?<![^/]){re.escape(key)}-[0-9a-f]{{32}}", url or "")
+        return match.group(0) if match else None
+
+    async def process(self, email: str, key: str, path: str, content_type: str):
+        """
+        Scale a spooled avatar, store it and point the user at it; the avatar outbox job
+        handler.
+
+        Storing is skipped when the scaled image is the user's current avatar. Images
+        that cannot be decoded are dropped rather than retried.
+
+        :param email: The user's email.
+        :type email: str
+        :param key: The user's avatar key.
+        :type key: str
+        :param path: The spooled file.
+        :type path: str
+        :param content_type: The declared content type of the upload.
+        :type content_type: str
+        """
+        spooled = Path(path)
+        if not spooled.exists():
+            # Already processed by a worker that died before acknowledging the job
+            logger.warning("Spooled avatar %s is gone, skipping", path)
+            return
+        try:
+            avatar = await run_in_threadpool(
+                prepare_avatar, spooled, self.size, self.quality, self.max_pixels
+            )
+        except InvalidAvatar as err:
+            logger.warning("Rejected avatar of %s (%s): %s", email, content_type, err)
+            self.rejected += 1
+            await run_in_threadpool(os.remove, spooled)
+            return
+
+        name = self.content_key(key, avatar)
+        async with self.session_factory() as db:
+            user = await repository_users.get_user_by_email(email, db)
+        previous = self.stored_key(key, user.avatar if user else None)
+        if user is None or previous == name:
+            self.unchanged += 1
+            await run_in_threadpool(os.remove, spooled)
+            return
+
+        prepared = spooled.with_suffix(".jpg")
+        await run_in_threadpool(prepared.write_bytes, avatar)
+        try:
+            url = await self.storage.save(name, prepared, "image/jpeg")
+        finally:
+            await run_in_threadpool(prepared.unlink, missing_ok=True)
+        async with self.session_factory() as db:
+            await repository_users.update_avatar(email, url, db)
+        self.stored += 1
+        await run_in_threadpool(os.remove, spooled)
+        if previous is not None:
+            try:
+                await self.storage.delete(previous)
+            except Exception as err:
+                logger.warning("Deleting avatar %s failed: %s", previous, err)
+
+    def snapshot(self) -> dict:
+        """
+        Report stored, unchanged and rejected avatars of this process.
+
+        :return: The pipeline counters.
+        :rtype: dict
+        """
+        return {"stored": self.stored, "unchanged": self.unchanged, "rejected": self.rejected}
+
+
+avatar_pipeline = AvatarPipeline(
+    create_storage(settings.avatar_storage),
+    avatar_outbox,
+    Path(settings.avatar_spool_dir),
+    settings.avatar_max_size,
+    map(str.strip, settings.avatar_content_types.split(",")),
+    size=settings.avatar_size,
+    quality=settings.avatar_quality,
+    max_pixels=settings.avatar_max_pixels,
+)
+avatar_outbox.handler("update_avatar")(avatar_pipeline.process)
+registry.register("avatars", avatar_pipeline.snapshot)
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+import redis.asyncio as redis
+from fastapi import Request, Response, status
+from pydantic import TypeAdapter
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+from src.services.metrics import registry
+from src.services.redis_client import redis_client
+
+
+logger = logging.getLogger(__name__)
+
+
+class ContactsCache:
+    """
+    Redis cache of serialized contact read responses, versioned per user.
+
+    Every user has a contacts version counter, bumped by each contact mutation. Cached
+    responses and their ETags are keyed by the version and the request parameters, so a
+    mutation makes every earlier entry unreachable and the entries just expire. The same
+    version and parameters always produce the same body, which makes the ETags strong:
+    a matching ``If-None-Match`` is answered with ``304`` after a single Redis read.
+
+    The version is current with the primary database, so ``produce`` must read from the
+    primary too: a lagging replica could return rows from before the latest mutation,
+    which would then be cached, and revalidated, under the new version.
+
+    A missing counter is initialised from the clock rather than from zero, so a counter
+    lost to eviction never brings back responses cached under an earlier version.
+    If Redis is unavailable responses are built from the database without an ETag.
+    """
+
+    VERSION = 1
+
+    def __init__(self, client: redis.Redis, ttl: int):
+        self.client = client
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def version_key(user_id: int) -> str:
+        return f"contacts-version:{user_id}"
+
+    async def version(self, user_id: int) -> int | None:
+        """
+        Get the contacts version of a user.
+
+        :param user_id: The user's ID.
+        :type user_id: int
+        :return: The current version, None if Redis is unavailable.
+        :rtype: int | None
+        """
+        key = self.version_key(user_id)
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.set(key, time.time_ns(), nx=True)
+                pipe.get(key)
+                _, version = await pipe.execute()
+        except RedisError as err:
+            logger.warning("Contacts version read failed: %s", err)
+            return None
+        return int(version)
+
+    async def bump(self, user_id: int):
+        """
+        Bump the contacts version of a user after a committed mutation.
+
+        :param user_id: The user's ID.
+        :type user_id: int
+        """
+        key = self.version_key(user_id)
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.set(key, time.time_ns(), nx=True)
+                pipe.incr(key)
+                await pipe.execute()
+        except RedisError as err:
+            logger.warning("Contacts version bump failed: %s", err)
+
+    def key(self, user_id: int, version: int, scope: str, params: dict) -> str:
+        """
+        Build the cache key of a response.
+
+        :param user_id: The user's ID.
+        :type user_id: int
+        :param version: The user's contacts version.
+        :type version: int
+        :param scope: The name of the cached read.
+        :type scope: str
+        :param params: The parameters the response depends on.
+        :type params: dict
+        :return: The cache key.
+        :rtype: str
+        """
+        digest = hashlib.sha256(
+            json.dumps(params, sort_keys=True, default=str).encode()
+        ).hexdigest()[:32]
+        return f"contacts:v{self.VERSION}:{user_id}:{version}:{scope}:{digest}"
+
+    @staticmethod
+    def etag(key: str) -> str:
+        return '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+    @staticmethod
+    def matches(request: Request, etag: str) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is None:
+            return False
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+
+    async def respond(
+        self,
+        request: Request,
+        user_id: int,
+        scope: str,
+        params: dict,
+        adapter: TypeAdapter,
+        produce: Callable[[], Awaitable[Any]],
+    ) -> Response:
+        """
+        Answer a contacts read from the cache, or with ``304`` if the client's copy is current.
+
+        :param request: The incoming request.
+        :type request: Request
+        :param user_id: The user's ID.
+        :type user_id: int
+        :param scope: The name of the cached read.
+        :type scope: str
+        :param params: The parameters the response depends on.
+        :type params: dict
+        :param adapter: Validates and serializes the produced data.
+        :type adapter: TypeAdapter
+        :param produce: Loads the data from the primary database on a miss.
+        :type produce: Callable[[], Awaitable[Any]]
+        :return: The JSON response.
+        :rtype: Response
+        """
+        version = await self.version(user_id)
+        if version is None:
+            body = adapter.dump_json(adapter.validate_python(await produce(), from_attributes=True))
+            return Response(body, media_type="application/json")
+
+        key = self.key(user_id, version, scope, params)
+        headers = {"ETag": self.etag(key), "Cache-Control": "private, no-cache"}
+        if self.matches(request, headers["ETag"]):
+            self.not_modified += 1
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        try:
+            body = await self.client.get(key)
+        except RedisError as err:
+            logger.warning("Contacts cache read failed: %s", err)
+            body = None
+        if body is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            body = adapter.dump_json(adapter.validate_python(await produce(), from_attributes=True))
+            try:
+                await self.client.set(key, body, ex=self.ttl)
+            except RedisError as err:
+                logger.warning("Contacts cache write failed: %s", err)
+        return Response(body, media_type="application/json", headers=headers)
+
+    def snapshot(self) -> dict:
+        """
+        Report hit, miss and not-modified counters.
+
+        :return: The cache counters.
+        :rtype: dict
+        """
+        return {"hits": self.hits, "misses": self.misses, "not_modified": self.not_modified}
+
+
+contacts_cache = ContactsCache(redis_client, settings.contacts_cache_ttl)
+registry.register("contacts_cache", contacts_cache.snapshot)
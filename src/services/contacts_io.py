@@ -0,0 +1,236 @@
+import csv
+import io
+import json
+import zlib
+from itertools import islice
+from pathlib import PurePath
+from typing import AsyncIterator, BinaryIO, Iterator, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.database.models import Contact, User
+from src.repository import contacts as repository_contacts
+from src.schemas import ContactImport
+
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FIELDS = ("id", "first_name", "last_name", "email", "phone", "birthday", "notes")
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+SUFFIXES = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+def detect_format(file: UploadFile, fmt: str = None) -> str:
+    """
+    Resolve the format of an uploaded contacts file.
+
+    :param file: The uploaded file.
+    :type file: UploadFile
+    :param fmt: Explicitly requested format, ``csv`` or ``ndjson``. Defaults to None.
+    :type fmt: str
+    :raises HTTPException: If the format is not supported or cannot be detected.
+    :return: ``csv`` or ``ndjson``.
+    :rtype: str
+    """
+    detected = fmt or CONTENT_TYPES.get((file.content_type or "").split(";")[0].strip())
+    if detected is None and file.filename:
+        detected = SUFFIXES.get(PurePath(file.filename).suffix.lower())
+    if detected not in ("csv", "ndjson"):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Upload a CSV or NDJSON file",
+        )
+    return detected
+
+
+def iter_rows(stream: BinaryIO, fmt: str) -> Iterator[Tuple[int, dict | str]]:
+    """
+    Lazily read records from a CSV (with header) or NDJSON byte stream.
+
+    :param stream: The uploaded byte stream.
+    :type stream: BinaryIO
+    :param fmt: ``csv`` or ``ndjson``.
+    :type fmt: str
+    :return: Pairs of row number and the raw record, or an error message for unreadable rows.
+        Reading stops at the first bytes that are not UTF-8, reported as an error of the
+        next row, since the rows before it may already be stored.
+    :rtype: Iterator[Tuple[int, dict | str]]
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    row_no = 0
+    try:
+        if fmt == "csv":
+            for row_no, row in enumerate(csv.DictReader(text), start=1):
+                yield row_no, {
+                    key: value or None for key, value in row.items() if key is not None
+                }
+        else:
+            for row_no, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as err:
+                    yield row_no, f"Invalid JSON: {err}"
+                    continue
+                yield row_no, record if isinstance(record, dict) else "Expected a JSON object"
+    except UnicodeDecodeError:
+        yield row_no + 1, "File must be UTF-8 encoded; the rest of the file was not imported"
+    finally:
+        text.detach()
+
+
+def validate_batch(rows: Iterator[Tuple[int, dict | str]], size: int):
+    """
+    Read and validate the next batch of rows.
+
+    :param rows: The row iterator returned by :func:`iter_rows`.
+    :type rows: Iterator[Tuple[int, dict | str]]
+    :param size: The maximum number of rows to read.
+    :type size: int
+    :return: Number of rows read, valid contacts and per-row errors.
+    :rtype: Tuple[int, List[ContactImport], List[dict]]
+    """
+    read, contacts, errors = 0, [], []
+    for row_no, record in islice(rows, size):
+        read += 1
+        if isinstance(record, str):
+            errors.append({"row": row_no, "errors": [record]})
+            continue
+        try:
+            contacts.append(ContactImport.model_validate(record))
+        except ValidationError as err:
+            errors.append(
+                {
+                    "row": row_no,
+                    "errors": [
+                        f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+                        for error in err.errors()
+                    ],
+                }
+            )
+    return read, contacts, errors
+
+
+async def import_contacts(
+    file: UploadFile, fmt: str, user: User, db: AsyncSession
+) -> dict:
+    """
+    Import contacts from an uploaded CSV or NDJSON file in batches.
+
+    The file is read and validated ``IMPORT_BATCH_SIZE`` rows at a time in a worker thread,
+    and each batch is stored with one multi-row insert, so memory stays bounded by the
+    batch size whatever the upload size. At most ``MAX_REPORTED_ERRORS`` row errors are
+    reported.
+
+    :param file: The uploaded file.
+    :type file: UploadFile
+    :param fmt: ``csv`` or ``ndjson``.
+    :type fmt: str
+    :param user: The user to import the contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: Number of imported and failed rows with the per-row errors.
+    :rtype: dict
+    """
+    rows = iter_rows(file.file, fmt)
+    report = {"imported": 0, "failed": 0, "errors": [], "errors_truncated": False}
+    while True:
+        read, contacts, errors = await run_in_threadpool(
+            validate_batch, rows, IMPORT_BATCH_SIZE
+        )
+        if not read:
+            break
+        report["imported"] += await repository_contacts.create_contacts(contacts, user, db)
+        report["failed"] += len(errors)
+        room = MAX_REPORTED_ERRORS - len(report["errors"])
+        report["errors"].extend(errors[:room])
+        report["errors_truncated"] |= len(errors) > room
+    return report
+
+
+def export_record(contact: Contact) -> dict:
+    """
+    Plain representation of a contact for export, without building a pydantic model.
+
+    :param contact: The contact to export.
+    :type contact: Contact
+    :return: Exported fields with the birthday as an ISO date.
+    :rtype: dict
+    """
+    record = {field: getattr(contact, field) for field in EXPORT_FIELDS}
+    birthday = record["birthday"]
+    record["birthday"] = birthday.date().isoformat() if hasattr(birthday, "date") else birthday.isoformat()
+    return record
+
+
+async def export_contacts(
+    session_factory: async_sessionmaker,
+    user: User,
+    fmt: str,
+    gzip: bool = False,
+) -> AsyncIterator[bytes]:
+    """
+    Stream all contacts of the user as CSV or NDJSON chunks.
+
+    Rows come from a server-side cursor in its own session, because the response body is
+    produced after the request-scoped session has been closed. Every ``EXPORT_BATCH_SIZE``
+    rows are encoded into one chunk, optionally gzip-compressed on the fly, so memory use
+    does not depend on the size of the address book.
+
+    :param session_factory: Factory of the session that reads the contacts.
+    :type session_factory: async_sessionmaker
+    :param user: The user to export contacts for.
+    :type user: User
+    :param fmt: ``csv`` or ``ndjson``.
+    :type fmt: str
+    :param gzip: Whether to gzip the stream. Defaults to False.
+    :type gzip: bool
+    :return: Encoded chunks of the export.
+    :rtype: AsyncIterator[bytes]
+    """
+    compressor = zlib.compressobj(wbits=31) if gzip else None
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS) if fmt == "csv" else None
+    if writer:
+        writer.writeheader()
+    rows = 0
+
+    def flush() -> bytes:
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    async with session_factory() as db:
+        contacts = await repository_contacts.stream_contacts(user, db, EXPORT_BATCH_SIZE)
+        async for contact in contacts:
+            record = export_record(contact)
+            if writer:
+                writer.writerow(record)
+            else:
+                buffer.write(json.dumps(record, ensure_ascii=False) + "\n")
+            rows += 1
+            if rows % EXPORT_BATCH_SIZE == 0:
+                chunk = flush()
+                if chunk:
+                    yield chunk
+
+    chunk = flush()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
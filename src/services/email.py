@@ -1,32 +1,59 @@
-import os
-from pathlib import Path
+from email.message import EmailMessage
+from email.utils import formataddr
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
 from pydantic import EmailStr
 
 from src.services.auth import auth_service
+from src.services.mailer import mailer
+from src.services.outbox import email_outbox
+from src.services.templates import template_service
 from src.conf.config import settings
 
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.email_username,
-    MAIL_PASSWORD=settings.email_password,
-    MAIL_FROM=settings.email_from,
-    MAIL_PORT=settings.email_port,
-    MAIL_SERVER=settings.email_server,
-    MAIL_FROM_NAME="Rest API Application",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / "templates",
-)
+def build_message(recipient: str, subject: str, html: str) -> EmailMessage:
+    """
+    Build an HTML email from the application's sender address.
+
+    :param recipient: The recipient's email address.
+    :type recipient: str
+    :param subject: The subject line.
+    :type subject: str
+    :param html: The HTML body.
+    :type html: str
+    :return: The message.
+    :rtype: EmailMessage
+    """
+    message = EmailMessage()
+    message["From"] = formataddr((settings.email_from_name, settings.email_from))
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.set_content(html, subtype="html")
+    return message
 
 
+@email_outbox.handler("confirm_email")
 async def send_email(email: EmailStr, username: str, host: str):
     """
     Send an email for email verification.
+    Runs in the email worker; delivery errors propagate, so the job is retried.
+
+    :param email: The user's email address.
+    :type email: EmailStr
+    :param username: The username of the user.
+    :type username: str
+    :param host: The host URL for the application.
+    :type host: str
+    """
+    token_verification = auth_service.create_email_token({"sub": email})
+    html = template_service.render(
+        "email_template.html", host=host, username=username, token=token_verification
+    )
+    await mailer.send(build_message(email, "Confirm your email", html))
+
+
+async def queue_confirmation_email(email: EmailStr, username: str, host: str):
+    """
+    Queue an email for email verification in the email outbox.
 
     :param email: The user's email address.
     :type email: EmailStr
@@ -35,18 +62,4 @@ async def send_email(email: EmailStr, username: str, host: str):
     :param host: The host URL for the application.
     :type host: str
     """
-    try: 
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject = "Confirm your email", 
-            recipients=[email], 
-            template_body={"host": host, 
-                           "username": username, 
-                           "token": token_verification},
-            subtype=MessageType.html
-        )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
-    except ConnectionErrors as err: 
-        print(err)
+    await email_outbox.enqueue("confirm_email", email=email, username=username, host=str(host))
@@ -0,0 +1,161 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from src.conf.config import settings
+from src.services.metrics import Histogram, registry
+
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds
+)
+
+
+def _timed(submitted: float, fn, *args):
+    # Runs in the executor: report how long the job queued and how long it ran
+    started = time.monotonic()
+    result = fn(*args)
+    return result, started - submitted, time.monotonic() - started
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification off the event loop in a bounded executor.
+
+    At most ``workers`` jobs run at a time and at most ``max_pending`` jobs (running
+    and queued) are accepted; further calls are rejected with 503 straight away. A job
+    that does not finish within ``timeout`` seconds also fails with 503.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_pending: int = 64,
+        timeout: float = 5,
+        executor: str = "thread",
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.executor_kind = executor
+        self._executor: Executor | None = None
+        self.pending = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.queue_wait = Histogram()
+        self.hash_time = Histogram()
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    def shutdown(self):
+        """
+        Stop the executor, cancelling queued jobs.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, fn, *args):
+        """
+        Run a hashing function in the executor.
+
+        :param fn: The function to run.
+        :param args: Arguments of the function.
+        :raises HTTPException: 503 if too many jobs are pending or the job times out.
+        :return: The result of the function.
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, try again later",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self.executor, _timed, time.monotonic(), fn, *args
+            )
+            result, waited, elapsed = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication timed out, try again later",
+                headers={"Retry-After": "1"},
+            )
+        finally:
+            self.pending -= 1
+        self.queue_wait.observe(waited)
+        self.hash_time.observe(elapsed)
+        return result
+
+    async def hash(self, password: str) -> str:
+        """
+        Hash a password.
+
+        :param password: The password to hash.
+        :type password: str
+        :return: The hashed password.
+        :rtype: str
+        """
+        return await self.run(_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """
+        Verify a password against its hash.
+
+        :param plain_password: The plain password.
+        :type plain_password: str
+        :param hashed_password: The hashed password.
+        :type hashed_password: str
+        :return: True if the passwords match, False otherwise.
+        :rtype: bool
+        """
+        return await self.run(_verify, plain_password, hashed_password)
+
+    def snapshot(self) -> dict:
+        """
+        Report executor load and timings.
+
+        :return: Pending, rejected and timed out jobs with queue wait and hash time histograms.
+        :rtype: dict
+        """
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+            "hash_seconds": self.hash_time.snapshot(),
+        }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+    timeout=settings.password_hash_timeout,
+    executor=settings.password_hash_executor,
+)
+registry.register("password_hashing", password_hasher.snapshot)
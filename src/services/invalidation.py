@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from typing import Callable, Dict
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from src.services.redis_client import redis_client
+
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationBus:
+    """
+    One Redis pub/sub subscription per worker, dispatching messages to in-process caches.
+
+    Each channel has a message handler and a reset handler. Reset handlers run after every
+    (re)subscription, because messages published while disconnected are lost, and after a
+    message handler fails, because its invalidation may not have been applied.
+    """
+
+    def __init__(self, client: redis.Redis):
+        self.client = client
+        self._handlers: Dict[str, Callable[[str], None]] = {}
+        self._resets: Dict[str, Callable[[], None]] = {}
+        self._listener: asyncio.Task | None = None
+
+    def subscribe(
+        self, channel: str, handler: Callable[[str], None], reset: Callable[[], None]
+    ):
+        """
+        Register the handlers of a channel.
+
+        :param channel: The Redis channel.
+        :type channel: str
+        :param handler: Called with every message published on the channel.
+        :type handler: Callable[[str], None]
+        :param reset: Called when messages may have been missed.
+        :type reset: Callable[[], None]
+        """
+        self._handlers[channel] = handler
+        self._resets[channel] = reset
+
+    def reset(self):
+        for reset in self._resets.values():
+            reset()
+
+    def dispatch(self, channel: str, data: str):
+        """
+        Pass a message to the handler of its channel. A failing handler is logged and its
+        channel reset, so one bad message never stops the listener.
+
+        :param channel: The Redis channel.
+        :type channel: str
+        :param data: The message.
+        :type data: str
+        """
+        try:
+            self._handlers[channel](data)
+        except Exception:
+            logger.exception("Invalidation handler of %s failed on %r", channel, data)
+            self._resets[channel]()
+
+    async def listen(self):
+        """
+        Dispatch messages of the subscribed channels until cancelled.
+        """
+        while True:
+            try:
+                async with self.client.pubsub() as pubsub:
+                    await pubsub.subscribe(*self._handlers)
+                    self.reset()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.dispatch(
+                                message["channel"].decode(), message["data"].decode()
+                            )
+            except RedisError as err:
+                logger.warning("Invalidation channel lost: %s", err)
+                self.reset()
+                await asyncio.sleep(1)
+
+    def start(self):
+        """
+        Start listening in the background.
+        """
+        if self._handlers and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.create_task(self.listen())
+
+    async def stop(self):
+        """
+        Stop listening.
+        """
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+invalidation_bus = InvalidationBus(redis_client)
@@ -0,0 +1,347 @@
+import asyncio
+import logging
+import time
+from email.message import EmailMessage
+
+import aiosmtplib
+
+from src.conf.config import settings
+from src.services.metrics import Histogram, registry
+
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPPool:
+    """
+    A small pool of authenticated SMTP connections that are kept open between sends.
+
+    Connections are opened lazily, up to ``size``. A connection that has been idle for
+    longer than ``max_idle`` seconds, or was dropped by the server, is reopened before
+    it is handed out.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: str | None = None,
+        password: str | None = None,
+        use_tls: bool = True,
+        start_tls: bool = False,
+        validate_certs: bool = True,
+        size: int = 2,
+        max_idle: float = 60,
+        timeout: float = 30,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.validate_certs = validate_certs
+        self.size = size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle: asyncio.LifoQueue | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self.connects = 0
+        self.reconnects = 0
+
+    def _ensure_queues(self):
+        # Created on first use, so the pool binds to the loop it is used on
+        if self._idle is None:
+            self._idle = asyncio.LifoQueue()
+            self._slots = asyncio.Semaphore(self.size)
+
+    async def connect(self) -> aiosmtplib.SMTP:
+        """
+        Open and authenticate a new connection.
+
+        :return: The connected client.
+        :rtype: aiosmtplib.SMTP
+        """
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls,
+            validate_certs=self.validate_certs,
+            timeout=self.timeout,
+        )
+        await smtp.connect()
+        if self.username:
+            await smtp.login(self.username, self.password)
+        self.connects += 1
+        return smtp
+
+    @staticmethod
+    async def discard(smtp: aiosmtplib.SMTP):
+        try:
+            await smtp.quit()
+        except aiosmtplib.SMTPException:
+            smtp.close()
+
+    async def acquire(self) -> aiosmtplib.SMTP:
+        """
+        Take a live connection from the pool, waiting if all of them are in use.
+
+        :return: The connected client.
+        :rtype: aiosmtplib.SMTP
+        """
+        self._ensure_queues()
+        await self._slots.acquire()
+        try:
+            while not self._idle.empty():
+                smtp, released_at = self._idle.get_nowait()
+                if smtp.is_connected and time.monotonic() - released_at < self.max_idle:
+                    return smtp
+                self.reconnects += 1
+                await self.discard(smtp)
+            return await self.connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, smtp: aiosmtplib.SMTP, broken: bool = False):
+        """
+        Return a connection to the pool.
+
+        :param smtp: The connection taken with :meth:`acquire`.
+        :type smtp: aiosmtplib.SMTP
+        :param broken: Whether the connection failed and must not be reused.
+        :type broken: bool
+        """
+        if broken:
+            smtp.close()
+        else:
+            self._idle.put_nowait((smtp, time.monotonic()))
+        self._slots.release()
+
+    async def close(self):
+        """
+        Close all idle connections.
+        """
+        if self._idle is None:
+            return
+        while not self._idle.empty():
+            smtp, _ = self._idle.get_nowait()
+            await self.discard(smtp)
+
+
+class SendRate:
+    """
+    Spaces sends so that at most ``rate`` messages per second leave the worker.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class Mailer:
+    """
+    Mail delivery service: queued messages are sent in batches over pooled SMTP connections.
+
+    One sender task runs per pooled connection. Each takes up to ``batch_size`` queued
+    messages, waiting at most ``batch_window`` seconds to fill a batch, and sends them
+    one after another over a single connection. A message that fails because the
+    connection went away is retried once on a fresh connection.
+    """
+
+    def __init__(
+        self,
+        pool: SMTPPool,
+        rate: float = 10,
+        batch_size: int = 50,
+        batch_window: float = 0.05,
+    ):
+        self.pool = pool
+        self.rate = SendRate(rate)
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self._queue: asyncio.Queue | None = None
+        self._senders: list[asyncio.Task] = []
+        self.sent = 0
+        self.failed = 0
+        self.batch_sizes = Histogram((1, 2, 5, 10, 20, 50, 100, 200))
+
+    def start(self):
+        """
+        Start the sender tasks.
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if not self._senders:
+            self._senders = [
+                asyncio.create_task(self.sender()) for _ in range(self.pool.size)
+            ]
+
+    async def stop(self):
+        """
+        Send the queued messages, then stop the sender tasks and close the connections.
+        """
+        if self._queue is not None:
+            await self._queue.join()
+        for task in self._senders:
+            task.cancel()
+        await asyncio.gather(*self._senders, return_exceptions=True)
+        self._senders = []
+        await self.pool.close()
+
+    def enqueue(self, message: EmailMessage) -> asyncio.Future:
+        """
+        Queue a message for delivery.
+
+        :param message: The message to send.
+        :type message: EmailMessage
+        :return: Resolved when the message is sent, failed with the SMTP error otherwise.
+        :rtype: asyncio.Future
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((message, future))
+        return future
+
+    async def send(self, message: EmailMessage):
+        """
+        Queue a message and wait until it is sent.
+
+        :param message: The message to send.
+        :type message: EmailMessage
+        """
+        await self.enqueue(message)
+
+    async def next_batch(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def sender(self):
+        while True:
+            batch = await self.next_batch()
+            try:
+                await self.send_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def send_batch(self, batch: list):
+        """
+        Send a batch of queued messages over one connection.
+
+        A message rejected by the server fails on its own; a connection that cannot be
+        (re)established fails the rest of the batch.
+
+        :param batch: Pairs of message and the future to resolve.
+        :type batch: list
+        """
+        self.batch_sizes.observe(len(batch))
+        try:
+            smtp = await self.pool.acquire()
+        except (aiosmtplib.SMTPException, OSError) as err:
+            logger.warning("SMTP connection failed: %s", err)
+            for _, future in batch:
+                self.fail(future, err)
+            return
+        broken = False
+        try:
+            for message, future in batch:
+                await self.rate.wait()
+                try:
+                    smtp = await self.deliver(smtp, message)
+                except (ConnectionError, OSError) as err:
+                    logger.warning("SMTP connection failed: %s", err)
+                    broken = True
+                    for _, pending in batch:
+                        self.fail(pending, err)
+                    break
+                except aiosmtplib.SMTPException as err:
+                    logger.warning("Sending email failed: %s", err)
+                    self.fail(future, err)
+                    continue
+                self.sent += 1
+                if not future.done():
+                    future.set_result(None)
+        finally:
+            self.pool.release(smtp, broken)
+
+    async def deliver(self, smtp: aiosmtplib.SMTP, message: EmailMessage) -> aiosmtplib.SMTP:
+        """
+        Send one message, reconnecting once if the connection went stale.
+
+        :param smtp: The connection to send over.
+        :type smtp: aiosmtplib.SMTP
+        :param message: The message to send.
+        :type message: EmailMessage
+        :return: The connection to use for the next message.
+        :rtype: aiosmtplib.SMTP
+        """
+        try:
+            await smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            self.pool.reconnects += 1
+            smtp.close()
+            smtp = await self.pool.connect()
+            await smtp.send_message(message)
+        return smtp
+
+    def fail(self, future: asyncio.Future, err: Exception):
+        if not future.done():
+            self.failed += 1
+            future.set_exception(err)
+            # Callers that only enqueue never retrieve it
+            future.exception()
+
+    def snapshot(self) -> dict:
+        """
+        Report sent and failed messages, queue length and connection churn.
+
+        :return: The delivery counters.
+        :rtype: dict
+        """
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "connects": self.pool.connects,
+            "reconnects": self.pool.reconnects,
+            "batch_size": self.batch_sizes.snapshot(),
+        }
+
+
+mailer = Mailer(
+    SMTPPool(
+        settings.email_server,
+        settings.email_port,
+        settings.email_username,
+        settings.email_password,
+        use_tls=settings.email_use_tls,
+        start_tls=settings.email_start_tls,
+        size=settings.email_pool_size,
+        max_idle=settings.email_max_idle,
+        timeout=settings.email_timeout,
+    ),
+    rate=settings.email_send_rate,
+    batch_size=settings.email_batch_size,
+    batch_window=settings.email_batch_window,
+)
+registry.register("mailer", mailer.snapshot)
@@ -0,0 +1,136 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Sequence
+
+from sqlalchemy import exc
+from sqlalchemy.pool import Pool
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    """
+    Cumulative histogram of observed values with fixed bucket bounds.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """
+        Record a single observation.
+
+        :param value: The observed value.
+        :type value: float
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> dict:
+        """
+        Return the current state of the histogram.
+
+        :return: Cumulative bucket counts, total count and sum of observations.
+        :rtype: dict
+        """
+        cumulative = {}
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            cumulative[f"le_{bound}"] = running
+        cumulative["le_inf"] = self.count
+        return {"buckets": cumulative, "count": self.count, "sum": self.sum}
+
+
+class PoolStats:
+    """
+    Checkout statistics of a SQLAlchemy connection pool.
+    """
+
+    def __init__(self):
+        self.pool: Pool | None = None
+        self.wait = Histogram()
+        self.timeouts = 0
+
+    def instrument(self, pool_cls: type[Pool]) -> type[Pool]:
+        """
+        Build a subclass of ``pool_cls`` that reports checkout waits to these stats.
+
+        :param pool_cls: The pool class to instrument, e.g. ``QueuePool``.
+        :type pool_cls: type[Pool]
+        :return: The instrumented pool class, to be passed as ``poolclass``.
+        :rtype: type[Pool]
+        """
+        stats = self
+
+        class InstrumentedPool(pool_cls):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                stats.pool = self
+
+            def _do_get(self):
+                start = time.perf_counter()
+                try:
+                    return super()._do_get()
+                except exc.TimeoutError:
+                    stats.timeouts += 1
+                    raise
+                finally:
+                    stats.wait.observe(time.perf_counter() - start)
+
+        InstrumentedPool.__name__ = f"Instrumented{pool_cls.__name__}"
+        return InstrumentedPool
+
+    def snapshot(self) -> dict:
+        """
+        Return the current pool usage together with checkout wait statistics.
+
+        :return: Pool size, checked out and overflow connections, timeouts and wait histogram.
+        :rtype: dict
+        """
+        pool = self.pool
+        return {
+            "size": pool.size() if pool else 0,
+            "checked_in": pool.checkedin() if pool else 0,
+            "checked_out": pool.checkedout() if pool else 0,
+            "overflow": max(pool.overflow(), 0) if pool else 0,
+            "timeouts": self.timeouts,
+            "wait_seconds": self.wait.snapshot(),
+        }
+
+
+class MetricsRegistry:
+    """
+    Named collection of snapshot callables exposed by the internal endpoints.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], dict]] = {}
+
+    def register(self, name: str, source: Callable[[], dict]):
+        """
+        Register a metrics source.
+
+        :param name: The name the metrics are reported under.
+        :type name: str
+        :param source: Callable returning the current metrics snapshot.
+        :type source: Callable[[], dict]
+        """
+        self._sources[name] = source
+
+    def collect(self) -> dict:
+        """
+        Collect snapshots from every registered source.
+
+        :return: Snapshots keyed by source name.
+        :rtype: dict
+        """
+        return {name: source() for name, source in self._sources.items()}
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,271 @@
+import asyncio
+import logging
+import os
+import socket
+from typing import Awaitable, Callable, Dict
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError, ResponseError
+
+from src.conf.config import settings
+from src.services.redis_client import redis_client
+
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[..., Awaitable[None]]
+
+
+class Outbox:
+    """
+    Durable job queue on a Redis stream, consumed by worker processes in a consumer group.
+
+    Routes append small job records with :meth:`enqueue`. Workers read them with
+    ``XREADGROUP`` and acknowledge a job once its handler succeeds. A failed job stays
+    pending and is claimed again after an exponential backoff; so is a job whose worker
+    died. After ``max_attempts`` deliveries the job is moved to the dead-letter stream.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        stream: str,
+        group: str,
+        dead_letter: str,
+        max_attempts: int = 5,
+        backoff: float = 5,
+        maxlen: int = 100000,
+    ):
+        self.client = client
+        self.stream = stream
+        self.group = group
+        self.dead_letter = dead_letter
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.maxlen = maxlen
+        self.handlers: Dict[str, Handler] = {}
+        self.processed = 0
+        self.retried = 0
+        self.dead = 0
+
+    async def enqueue(self, kind: str, **fields: str) -> str:
+        """
+        Append a job to the stream.
+
+        :param kind: The job kind, selecting the worker's handler.
+        :type kind: str
+        :param fields: The job arguments.
+        :type fields: str
+        :return: The stream entry ID.
+        :rtype: str
+        """
+        entry_id = await self.client.xadd(
+            self.stream, {"kind": kind, **fields}, maxlen=self.maxlen, approximate=True
+        )
+        return entry_id.decode()
+
+    def handler(self, kind: str):
+        """
+        Register the handler of a job kind, called with the job fields as keyword arguments.
+
+        :param kind: The job kind.
+        :type kind: str
+        """
+        def register(fn: Handler) -> Handler:
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    async def ensure_group(self):
+        """
+        Create the stream and the consumer group if they do not exist.
+        """
+        try:
+            await self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as err:
+            if "BUSYGROUP" not in str(err):
+                raise
+
+    def retry_delay(self, deliveries: int) -> float:
+        return self.backoff * 2 ** (deliveries - 1)
+
+    async def process(self, entry_id: bytes, fields: dict, deliveries: int):
+        """
+        Run the handler of a job, then acknowledge it, leave it pending for a retry or
+        move it to the dead-letter stream.
+
+        :param entry_id: The stream entry ID.
+        :type entry_id: bytes
+        :param fields: The job record.
+        :type fields: dict
+        :param deliveries: How many times the job has been delivered, this time included.
+        :type deliveries: int
+        """
+        job = {key.decode(): value.decode() for key, value in fields.items()}
+        kind = job.pop("kind", None)
+        try:
+            handler = self.handlers[kind]
+        except KeyError:
+            await self.bury(entry_id, job, kind, deliveries, f"Unknown job kind: {kind}")
+            return
+        try:
+            await handler(**job)
+        except Exception as err:
+            logger.warning("Job %s (%s) failed on attempt %d: %s", entry_id, kind, deliveries, err)
+            if deliveries >= self.max_attempts:
+                await self.bury(entry_id, job, kind, deliveries, repr(err))
+            else:
+                self.retried += 1
+            return
+        await self.client.xack(self.stream, self.group, entry_id)
+        self.processed += 1
+
+    async def bury(self, entry_id: bytes, job: dict, kind: str | None, deliveries: int, error: str):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.xadd(
+                self.dead_letter,
+                {
+                    **job,
+                    "kind": kind or "",
+                    "entry_id": entry_id,
+                    "attempts": deliveries,
+                    "error": error,
+                },
+                maxlen=self.maxlen,
+                approximate=True,
+            )
+            pipe.xack(self.stream, self.group, entry_id)
+            await pipe.execute()
+        self.dead += 1
+
+    async def claim_due(self, consumer: str, count: int) -> list:
+        """
+        Claim pending jobs whose backoff has passed, including jobs of dead workers.
+
+        :param consumer: The name of this consumer.
+        :type consumer: str
+        :param count: The maximum number of jobs to claim.
+        :type count: int
+        :return: Claimed jobs as ``(entry_id, fields, deliveries)``.
+        :rtype: list
+        """
+        pending = await self.client.xpending_range(
+            self.stream, self.group, "-", "+", count,
+            idle=int(self.retry_delay(1) * 1000),
+        )
+        due = {}
+        for entry in pending:
+            idle = entry["time_since_delivered"] / 1000
+            if idle >= self.retry_delay(entry["times_delivered"]):
+                due[entry["message_id"]] = entry["times_delivered"]
+        if not due:
+            return []
+        # XCLAIM with the same min idle time, so only one worker wins each job
+        claimed = await self.client.xclaim(
+            self.stream, self.group, consumer, int(self.retry_delay(1) * 1000), list(due)
+        )
+        trimmed = [entry_id for entry_id, fields in claimed if not fields]
+        if trimmed:
+            await self.client.xack(self.stream, self.group, *trimmed)
+        return [
+            (entry_id, fields, due[entry_id] + 1)
+            for entry_id, fields in claimed
+            if fields
+        ]
+
+    async def read_new(self, consumer: str, count: int, block: int) -> list:
+        """
+        Read jobs never delivered to any consumer.
+
+        :param consumer: The name of this consumer.
+        :type consumer: str
+        :param count: The maximum number of jobs to read.
+        :type count: int
+        :param block: How long to wait for new jobs, in milliseconds.
+        :type block: int
+        :return: Jobs as ``(entry_id, fields, deliveries)``.
+        :rtype: list
+        """
+        response = await self.client.xreadgroup(
+            self.group, consumer, {self.stream: ">"}, count=count, block=block
+        )
+        return [
+            (entry_id, fields, 1)
+            for _, entries in response
+            for entry_id, fields in entries
+        ]
+
+    async def run_once(self, consumer: str, count: int = 50, block: int = 1000) -> int:
+        """
+        Process one round of due retries and new jobs, concurrently.
+
+        :param consumer: The name of this consumer.
+        :type consumer: str
+        :param count: The maximum number of jobs per round.
+        :type count: int
+        :param block: How long to wait for new jobs, in milliseconds.
+        :type block: int
+        :return: The number of jobs processed.
+        :rtype: int
+        """
+        jobs = await self.claim_due(consumer, count)
+        if len(jobs) < count:
+            jobs += await self.read_new(consumer, count - len(jobs), block)
+        await asyncio.gather(*(self.process(*job) for job in jobs))
+        return len(jobs)
+
+    async def run(self, consumer: str | None = None, count: int = 50):
+        """
+        Consume jobs until cancelled.
+
+        Redis errors do not stop the loop: the error is logged and the round is retried
+        after the base backoff, recreating the consumer group in case it was lost. Jobs
+        delivered but not acknowledged stay pending and are claimed again.
+
+        :param consumer: The name of this consumer. Defaults to the host name and PID.
+        :type consumer: str | None
+        :param count: The maximum number of jobs processed concurrently.
+        :type count: int
+        """
+        consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        # Wake up at least once per base backoff to pick up due retries
+        block = max(int(self.retry_delay(1) * 1000), 1)
+        ready = False
+        while True:
+            try:
+                if not ready:
+                    await self.ensure_group()
+                    ready = True
+                await self.run_once(consumer, count, block)
+            except RedisError as err:
+                logger.warning("Outbox %s lost Redis: %s", self.stream, err)
+                ready = False
+                await asyncio.sleep(self.retry_delay(1))
+
+    def snapshot(self) -> dict:
+        """
+        Report processed, retried and dead-lettered jobs of this process.
+
+        :return: The job counters.
+        :rtype: dict
+        """
+        return {"processed": self.processed, "retried": self.retried, "dead": self.dead}
+
+
+email_outbox = Outbox(
+    redis_client,
+    settings.email_outbox_stream,
+    settings.email_outbox_group,
+    settings.email_outbox_dead_letter,
+    max_attempts=settings.email_outbox_max_attempts,
+    backoff=settings.email_outbox_backoff,
+    maxlen=settings.email_outbox_maxlen,
+)
+
+avatar_outbox = Outbox(
+    redis_client,
+    settings.avatar_outbox_stream,
+    settings.avatar_outbox_group,
+    settings.avatar_outbox_dead_letter,
+    max_attempts=settings.avatar_outbox_max_attempts,
+)
@@ -0,0 +1,239 @@
+import logging
+import math
+import time
+
+import redis.asyncio as redis
+from fastapi import Depends, HTTPException, Request, status
+from redis.exceptions import RedisError
+from starlette.datastructures import MutableHeaders
+
+from src.conf.config import settings
+from src.database.models import User
+from src.services.auth import auth_service
+from src.services.metrics import registry
+from src.services.redis_client import redis_client
+from src.services.ttl_cache import TTLCache
+
+
+logger = logging.getLogger(__name__)
+
+
+# GCRA: the key holds the theoretical arrival time (TAT) of the next request in ms.
+# A request is allowed if it does not arrive more than ``limit`` emission intervals
+# before the TAT. Denied requests leave the key untouched.
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - limit * interval
+if allow_at > now then
+    return {0, 0, allow_at - now, tat - now}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return {1, math.floor((now - allow_at) / interval), 0, new_tat - now}
+"""
+
+
+class RateLimitResult:
+    """
+    Outcome of a rate limit check.
+    """
+
+    def __init__(
+        self, policy: str, limit: int, seconds: int, allowed: bool, remaining: int,
+        retry_after: float, reset: float,
+    ):
+        self.policy = policy
+        self.limit = limit
+        self.seconds = seconds
+        self.allowed = allowed
+        self.remaining = remaining
+        self.retry_after = retry_after
+        self.reset = reset
+
+    def headers(self) -> dict:
+        """
+        Build the ``RateLimit-*`` headers, with ``Retry-After`` for denied requests.
+
+        :return: The response headers.
+        :rtype: dict
+        """
+        headers = {
+            "RateLimit-Policy": f'{self.limit};w={self.seconds};name="{self.policy}"',
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(math.ceil(self.retry_after))
+        return headers
+
+
+class RateLimiter:
+    """
+    Rate limiter shared by all workers, running GCRA in a single atomic Redis script.
+
+    GCRA allows ``limit`` requests per ``seconds`` with the requests spread over the
+    window, so unlike a fixed window it never lets through a double burst at a window
+    edge. A denied key stays denied until a known point in time, so every worker also
+    remembers denials locally until then and rejects repeated requests without a Redis
+    round trip. If Redis is unavailable requests are let through.
+    """
+
+    PREFIX = "rate-limit"
+
+    def __init__(self, client: redis.Redis, local_size: int):
+        self.client = client
+        self._script = None
+        self.denied = TTLCache(local_size, 0)
+        self.allowed_count = 0
+        self.denied_count = 0
+        self.local_denied_count = 0
+        self.errors = 0
+
+    @property
+    def script(self):
+        # Registered once per client; EVALSHA with a fallback to EVAL on a cold server
+        if self._script is None or self._script.registered_client is not self.client:
+            self._script = self.client.register_script(GCRA_SCRIPT)
+        return self._script
+
+    def key(self, policy: str, identity: str) -> str:
+        return f"{self.PREFIX}:{policy}:{identity}"
+
+    async def hit(self, policy: str, identity: str, limit: int, seconds: int) -> RateLimitResult | None:
+        """
+        Count a request against a policy.
+
+        :param policy: The policy name.
+        :type policy: str
+        :param identity: The client or user the request is counted for.
+        :type identity: str
+        :param limit: The number of requests allowed per window.
+        :type limit: int
+        :param seconds: The window in seconds.
+        :type seconds: int
+        :return: The outcome, None if Redis is unavailable.
+        :rtype: RateLimitResult | None
+        """
+        key = self.key(policy, identity)
+        denied = self.denied.get(key)
+        if denied is not None:
+            retry_at, reset_at = denied
+            now = time.monotonic()
+            self.local_denied_count += 1
+            return RateLimitResult(
+                policy, limit, seconds, False, 0, retry_at - now, reset_at - now
+            )
+
+        interval = seconds * 1000 / limit
+        try:
+            allowed, remaining, retry_after, reset = await self.script(
+                keys=[key], args=[interval, limit]
+            )
+        except RedisError as err:
+            self.errors += 1
+            logger.warning("Rate limit check failed: %s", err)
+            return None
+
+        result = RateLimitResult(
+            policy, limit, seconds, bool(allowed), remaining, retry_after / 1000, reset / 1000
+        )
+        if result.allowed:
+            self.allowed_count += 1
+        else:
+            self.denied_count += 1
+            now = time.monotonic()
+            self.denied.set(
+                key, (now + result.retry_after, now + result.reset), ttl=result.retry_after
+            )
+        return result
+
+    def snapshot(self) -> dict:
+        """
+        Report allowed and denied requests.
+
+        :return: The limiter counters.
+        :rtype: dict
+        """
+        return {
+            "allowed": self.allowed_count,
+            "denied": self.denied_count,
+            "denied_locally": self.local_denied_count,
+            "errors": self.errors,
+            "local_entries": len(self.denied),
+        }
+
+
+rate_limiter = RateLimiter(redis_client, settings.rate_limit_local_size)
+registry.register("rate_limit", rate_limiter.snapshot)
+
+
+class RateLimit:
+    """
+    Route dependency limiting requests per client address to ``times`` per ``seconds``.
+
+    The outcome is kept in ``request.state`` and turned into response headers by
+    :class:`RateLimitHeadersMiddleware`.
+    """
+
+    def __init__(self, policy: str, times: int, seconds: int):
+        self.policy = policy
+        self.times = times
+        self.seconds = seconds
+
+    async def check(self, request: Request, identity: str):
+        result = await rate_limiter.hit(self.policy, identity, self.times, self.seconds)
+        if result is None:
+            return
+        request.state.rate_limit = result
+        if not result.allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers=result.headers(),
+            )
+
+    async def __call__(self, request: Request):
+        await self.check(request, request.client.host if request.client else "unknown")
+
+
+class UserRateLimit(RateLimit):
+    """
+    Route dependency limiting requests per authenticated user to ``times`` per ``seconds``.
+    """
+
+    async def __call__(
+        self, request: Request, current_user: User = Depends(auth_service.get_current_principal)
+    ):
+        await self.check(request, f"user:{current_user.id}")
+
+
+class RateLimitHeadersMiddleware:
+    """
+    Adds the ``RateLimit-*`` headers of the request's rate limit check to the response,
+    including responses returned directly by the routes, like cached and streamed ones.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                result = scope.get("state", {}).get("rate_limit")
+                if result is not None:
+                    MutableHeaders(scope=message).update(result.headers())
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
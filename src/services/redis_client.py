@@ -0,0 +1,17 @@
+import redis.asyncio as redis
+
+from src.conf.config import settings
+
+
+redis_client = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0)
+
+
+# Dependency
+def get_redis() -> redis.Redis:
+    """
+    Shared asyncio Redis client of the worker.
+
+    :return: The Redis client.
+    :rtype: redis.Redis
+    """
+    return redis_client
@@ -0,0 +1,75 @@
+import redis.asyncio as redis
+
+from src.services.redis_client import redis_client
+
+
+class RefreshTokenStore:
+    """
+    Redis state of issued refresh tokens.
+
+    Every refresh token has an ID (``jti``) and belongs to a family, started at login and
+    carried over on every rotation. A token ID is stored until the token expires and can
+    be used exactly once. Presenting an already used token is treated as theft and revokes
+    the whole family, as does logging out.
+    """
+
+    def __init__(self, client: redis.Redis):
+        self.client = client
+
+    @staticmethod
+    def token_key(jti: str) -> str:
+        return f"refresh-token:{jti}"
+
+    @staticmethod
+    def family_key(family: str) -> str:
+        return f"refresh-family:{family}"
+
+    async def issue(self, jti: str, family: str, email: str, ttl: int):
+        """
+        Record a newly issued refresh token and extend the lifetime of its family.
+
+        :param jti: The token ID.
+        :type jti: str
+        :param family: The token family.
+        :type family: str
+        :param email: The email of the token owner.
+        :type email: str
+        :param ttl: The lifetime of the token in seconds.
+        :type ttl: int
+        """
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(self.token_key(jti), family, ex=ttl)
+            pipe.set(self.family_key(family), email, ex=ttl)
+            await pipe.execute()
+
+    async def consume(self, jti: str, family: str) -> bool:
+        """
+        Use up a refresh token. Reusing a token revokes its family.
+
+        :param jti: The token ID.
+        :type jti: str
+        :param family: The token family.
+        :type family: str
+        :return: True if the token was unused and its family is still active.
+        :rtype: bool
+        """
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.getdel(self.token_key(jti))
+            pipe.exists(self.family_key(family))
+            stored_family, family_active = await pipe.execute()
+        if stored_family is None:
+            await self.revoke_family(family)
+            return False
+        return bool(family_active) and stored_family.decode() == family
+
+    async def revoke_family(self, family: str):
+        """
+        Revoke every refresh token of a family.
+
+        :param family: The token family.
+        :type family: str
+        """
+        await self.client.delete(self.family_key(family))
+
+
+refresh_token_store = RefreshTokenStore(redis_client)
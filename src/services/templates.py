@@ -0,0 +1,83 @@
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
+
+
+TEMPLATE_FOLDER = Path(__file__).parent / "templates"
+
+
+class TemplateService:
+    """
+    Email templates, loaded and compiled once and kept in memory.
+
+    :meth:`load` compiles every template of the folder, normally at startup; a template
+    missing from the cache is compiled on first use. Rendering never touches the file
+    system, and :meth:`render_many` renders one template for a whole batch of messages.
+    """
+
+    def __init__(self, folder: Path = TEMPLATE_FOLDER):
+        self.environment = Environment(
+            loader=FileSystemLoader(folder),
+            autoescape=select_autoescape(default=True),
+            auto_reload=False,
+            cache_size=-1,
+        )
+        self._compiled: Dict[str, Template] = {}
+
+    def load(self):
+        """
+        Compile every template of the folder.
+        """
+        for name in self.environment.list_templates():
+            self._compiled[name] = self.environment.get_template(name)
+
+    def get(self, name: str) -> Template:
+        """
+        Get a compiled template.
+
+        :param name: The template file name.
+        :type name: str
+        :return: The compiled template.
+        :rtype: Template
+        """
+        template = self._compiled.get(name)
+        if template is None:
+            template = self._compiled[name] = self.environment.get_template(name)
+        return template
+
+    def render(self, name: str, **context) -> str:
+        """
+        Render a template.
+
+        :param name: The template file name.
+        :type name: str
+        :param context: The template variables.
+        :return: The rendered text.
+        :rtype: str
+        """
+        return self.get(name).render(context)
+
+    def render_many(self, name: str, contexts: Iterable[dict]) -> List[str]:
+        """
+        Render a template once per context, for batch sends.
+
+        :param name: The template file name.
+        :type name: str
+        :param contexts: The template variables of each message.
+        :type contexts: Iterable[dict]
+        :return: The rendered texts, in the order of ``contexts``.
+        :rtype: List[str]
+        """
+        template = self.get(name)
+        render = template.root_render_func
+        new_context = template.new_context
+        concat = self.environment.concat
+        try:
+            return [concat(render(new_context(context))) for context in contexts]
+        except Exception:
+            # Same error reporting as Template.render, with template line numbers
+            self.environment.handle_exception()
+
+
+template_service = TemplateService()
@@ -0,0 +1,51 @@
+import hashlib
+import time
+
+from src.conf.config import settings
+from src.services.metrics import registry
+from src.services.ttl_cache import TTLCache
+
+
+class TokenCache:
+    """
+    In-process cache of verified access token claims, keyed by a digest of the token.
+
+    Entries expire together with the token (its ``exp`` claim). Cached claims are still
+    checked against the user's token version on every request, which is how access
+    tokens are revoked.
+    """
+
+    def __init__(self, maxsize: int):
+        self.local = TTLCache(maxsize, 0)
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> dict | None:
+        """
+        Get the cached claims of a verified token.
+
+        :param token: The encoded token.
+        :type token: str
+        :return: The verified claims, None if the token is not cached or has expired.
+        :rtype: dict | None
+        """
+        return self.local.get(self.digest(token))
+
+    def set(self, token: str, claims: dict):
+        """
+        Cache the claims of a verified token until the token expires.
+
+        :param token: The encoded token.
+        :type token: str
+        :param claims: The verified claims, with an ``exp`` timestamp.
+        :type claims: dict
+        """
+        ttl = claims["exp"] - time.time()
+        if ttl > 0:
+            self.local.set(self.digest(token), claims, ttl=ttl)
+
+
+token_cache = TokenCache(settings.token_cache_size)
+registry.register("token_cache", token_cache.local.snapshot)
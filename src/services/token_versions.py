@@ -0,0 +1,85 @@
+import logging
+import time
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+from src.services.invalidation import invalidation_bus
+from src.services.metrics import registry
+from src.services.redis_client import redis_client
+from src.services.ttl_cache import TTLCache
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenVersions:
+    """
+    Per-user token versions, stamped into access tokens as the ``ver`` claim.
+
+    Bumping a user's version invalidates every access token issued before. Versions live
+    in a Redis hash and are cached in every worker; a bump is broadcast through the
+    invalidation bus, so checking a token normally costs no I/O at all.
+
+    A missing version is initialised from the clock rather than from zero, so a version
+    lost with Redis never revalidates tokens stamped with an earlier one.
+    """
+
+    KEY = "token-versions"
+    CHANNEL = "token-versions:bump"
+
+    def __init__(self, client: redis.Redis, local_size: int, local_ttl: float):
+        self.client = client
+        self.local = TTLCache(local_size, local_ttl)
+
+    async def get(self, user_id: int) -> int | None:
+        """
+        Get the current token version of a user.
+
+        :param user_id: The user's ID.
+        :type user_id: int
+        :return: The version, None if Redis is unavailable.
+        :rtype: int | None
+        """
+        version = self.local.get(user_id)
+        if version is not None:
+            return version
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.hsetnx(self.KEY, user_id, time.time_ns())
+                pipe.hget(self.KEY, user_id)
+                _, version = await pipe.execute()
+        except RedisError as err:
+            logger.warning("Token version read failed: %s", err)
+            return None
+        version = int(version)
+        self.local.set(user_id, version)
+        return version
+
+    async def bump(self, user_id: int) -> int:
+        """
+        Bump the token version of a user, invalidating the access tokens issued so far.
+
+        :param user_id: The user's ID.
+        :type user_id: int
+        :return: The new version.
+        :rtype: int
+        """
+        self.local.pop(user_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hsetnx(self.KEY, user_id, time.time_ns())
+            pipe.hincrby(self.KEY, user_id, 1)
+            pipe.publish(self.CHANNEL, user_id)
+            _, version, _ = await pipe.execute()
+        return version
+
+    def evict(self, user_id: str):
+        self.local.pop(int(user_id))
+
+
+token_versions = TokenVersions(
+    redis_client, settings.token_version_local_size, settings.token_version_local_ttl
+)
+invalidation_bus.subscribe(TokenVersions.CHANNEL, token_versions.evict, token_versions.local.clear)
+registry.register("token_versions", token_versions.local.snapshot)
@@ -0,0 +1,95 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class TTLCache:
+    """
+    Bounded in-process cache with per-entry expiry and LRU eviction.
+
+    Not thread-safe; meant to be used from the event loop of a single worker.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a live entry and mark it as recently used.
+
+        :param key: The entry key.
+        :type key: Hashable
+        :param default: Returned on a miss. Defaults to None.
+        :type default: Any
+        :return: The cached value or ``default``.
+        :rtype: Any
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float = None):
+        """
+        Store an entry, evicting the least recently used ones above ``maxsize``.
+
+        :param key: The entry key.
+        :type key: Hashable
+        :param value: The value to cache.
+        :type value: Any
+        :param ttl: Lifetime of the entry in seconds. Defaults to the cache ``ttl``.
+        :type ttl: float
+        """
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable):
+        """
+        Remove an entry if present.
+
+        :param key: The entry key.
+        :type key: Hashable
+        """
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def snapshot(self) -> dict:
+        """
+        Report the size and hit/miss/eviction counters of the cache.
+
+        :return: The cache counters.
+        :rtype: dict
+        """
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
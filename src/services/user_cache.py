@@ -0,0 +1,422 @@
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+from src.database.models import User
+from src.services.invalidation import invalidation_bus
+from src.services.metrics import registry
+from src.services.redis_client import redis_client
+from src.services.ttl_cache import TTLCache
+
+
+logger = logging.getLogger(__name__)
+
+
+class UserCache:
+    """
+    Two-tier cache of the users returned by ``Auth.get_current_user``.
+
+    The first tier is a small in-process TTL/LRU cache, the second a Redis key per user.
+    Only the fields the routes need are stored, as a compact JSON document, never the
+    ORM instance itself. The format version is part of the key, so a deploy that changes
+    the projection never reads documents written by the previous one.
+
+    User mutations write the new projection through to Redis (:meth:`write`) and broadcast
+    on a Redis channel so every worker drops its local copy. Misses are filled with
+    ``SET NX`` (:meth:`set`), so a reader holding a row loaded before a mutation cannot
+    overwrite the written-through value. Redis failures are logged and treated as misses.
+
+    :meth:`get_or_load` coalesces concurrent misses: inside a worker the requests for a
+    user await a single load, across workers a short Redis lock lets one worker load
+    while the others wait for the key to be filled. Documents record how long their load
+    took, and hot keys are refreshed probabilistically before they expire (XFetch), so
+    they never expire under load all at once.
+    """
+
+    VERSION = 2
+    FIELDS = ("id", "username", "email", "created_at", "avatar", "confirmed")
+    CHANNEL = "user-cache:invalidate"
+    LOCK_POLL_INTERVAL = 0.02
+
+    # Overwrite the key only if it still holds the document the refresh started from
+    REFRESH_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+end
+return false
+"""
+    UNLOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        ttl: int,
+        local_size: int = 0,
+        local_ttl: float = 0,
+        lock_ttl: float = 2,
+        early_refresh_beta: float = 1,
+    ):
+        self.client = client
+        self.ttl = ttl
+        self.local = TTLCache(local_size, local_ttl)
+        self.lock_ttl = lock_ttl
+        self.early_refresh_beta = early_refresh_beta
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self.loads = 0
+        self.coalesced = 0
+        self.lock_waits = 0
+        self.early_refreshes = 0
+
+    @classmethod
+    def key(cls, email: str) -> str:
+        return f"user:v{cls.VERSION}:{email}"
+
+    @classmethod
+    def lock_key(cls, email: str) -> str:
+        return f"user-lock:v{cls.VERSION}:{email}"
+
+    @classmethod
+    def dump(cls, user: User, load_time: float = 0) -> bytes:
+        """
+        Serialize the cached projection of a user.
+
+        :param user: The user to serialize.
+        :type user: User
+        :param load_time: How long loading the user took, in seconds.
+        :type load_time: float
+        :return: The JSON document.
+        :rtype: bytes
+        """
+        data = {field: getattr(user, field) for field in cls.FIELDS}
+        if data["created_at"] is not None:
+            data["created_at"] = data["created_at"].isoformat()
+        data["v"] = cls.VERSION
+        data["lt"] = round(load_time, 4)
+        return json.dumps(data, separators=(",", ":")).encode()
+
+    @classmethod
+    def decode(cls, payload: bytes) -> tuple[dict | None, float]:
+        """
+        Parse a cached user projection into model fields and its load time.
+
+        :param payload: The JSON document written by :meth:`dump`.
+        :type payload: bytes
+        :return: The user fields, None for other format versions, and the load time.
+        :rtype: tuple[dict | None, float]
+        """
+        data = json.loads(payload)
+        if data.pop("v", None) != cls.VERSION:
+            return None, 0
+        load_time = data.pop("lt", 0)
+        if data["created_at"] is not None:
+            data["created_at"] = datetime.fromisoformat(data["created_at"])
+        return data, load_time
+
+    @classmethod
+    def parse(cls, payload: bytes) -> dict | None:
+        """
+        Parse a cached user projection into model fields.
+
+        :param payload: The JSON document written by :meth:`dump`.
+        :type payload: bytes
+        :return: The user fields, None for other format versions.
+        :rtype: dict | None
+        """
+        return cls.decode(payload)[0]
+
+    @classmethod
+    def load(cls, payload: bytes) -> User | None:
+        """
+        Deserialize a cached user projection.
+
+        :param payload: The JSON document written by :meth:`dump`.
+        :type payload: bytes
+        :return: A detached user with the cached fields, None for other format versions.
+        :rtype: User | None
+        """
+        data = cls.parse(payload)
+        return User(**data) if data is not None else None
+
+    async def get(self, email: str) -> User | None:
+        """
+        Get a cached user, from the local tier first and from Redis second.
+
+        :param email: The user's email.
+        :type email: str
+        :return: A fresh detached user built from the cached fields, None on a miss.
+        :rtype: User | None
+        """
+        data = self.local.get(email)
+        if data is not None:
+            return User(**data)
+        try:
+            payload = await self.client.get(self.key(email))
+        except RedisError as err:
+            logger.warning("User cache read failed: %s", err)
+            return None
+        data = self.parse(payload) if payload is not None else None
+        if data is None:
+            self.redis_misses += 1
+            return None
+        self.redis_hits += 1
+        self.local.set(email, data)
+        return User(**data)
+
+    async def set(self, user: User, load_time: float = 0):
+        """
+        Fill the cache after a miss with a single ``SET ... EX ... NX``.
+
+        An entry written in the meantime by :meth:`write` is kept.
+
+        :param user: The user loaded from the database.
+        :type user: User
+        :param load_time: How long loading the user took, in seconds.
+        :type load_time: float
+        """
+        payload = self.dump(user, load_time)
+        self.local.set(user.email, self.parse(payload))
+        try:
+            await self.client.set(self.key(user.email), payload, ex=self.ttl, nx=True)
+        except RedisError as err:
+            logger.warning("User cache write failed: %s", err)
+
+    def should_refresh(self, load_time: float, ttl_left: float) -> bool:
+        """
+        Decide whether to refresh a cached document before it expires (XFetch).
+
+        The closer the expiry and the longer the load, the likelier an early refresh.
+
+        :param load_time: How long loading the document took, in seconds.
+        :type load_time: float
+        :param ttl_left: Seconds until the document expires.
+        :type ttl_left: float
+        :return: True if this reader should refresh the document.
+        :rtype: bool
+        """
+        if load_time <= 0 or ttl_left < 0:
+            return False
+        return -load_time * self.early_refresh_beta * math.log(1 - random.random()) >= ttl_left
+
+    async def get_or_load(
+        self, email: str, loader: Callable[[], Awaitable[User | None]]
+    ) -> User | None:
+        """
+        Get a cached user, loading it at most once per worker and, while the Redis lock
+        holds, once across workers.
+
+        :param email: The user's email.
+        :type email: str
+        :param loader: Loads the user from the database.
+        :type loader: Callable[[], Awaitable[User | None]]
+        :return: A fresh detached user built from the cached fields, None if there is no such user.
+        :rtype: User | None
+        """
+        data = self.local.get(email)
+        if data is not None:
+            return User(**data)
+
+        future = self._inflight.get(email)
+        if future is not None:
+            self.coalesced += 1
+            try:
+                data = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The loading request went away, load on behalf of this one
+                return await self.get_or_load(email, loader)
+            return User(**data) if data is not None else None
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[email] = future
+        try:
+            data = await self._load(email, loader)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as err:
+            future.set_exception(err)
+            # Waiters re-raise it; mark it retrieved in case there are none
+            future.exception()
+            raise
+        else:
+            future.set_result(data)
+        finally:
+            del self._inflight[email]
+        return User(**data) if data is not None else None
+
+    async def _fetch(self, loader: Callable[[], Awaitable[User | None]]):
+        self.loads += 1
+        started = time.monotonic()
+        user = await loader()
+        return user, time.monotonic() - started
+
+    async def _load(self, email: str, loader: Callable[[], Awaitable[User | None]]) -> dict | None:
+        key = self.key(email)
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.pttl(key)
+                payload, pttl = await pipe.execute()
+        except RedisError as err:
+            logger.warning("User cache read failed: %s", err)
+            user, _ = await self._fetch(loader)
+            return self.parse(self.dump(user)) if user is not None else None
+
+        data, load_time = self.decode(payload) if payload is not None else (None, 0)
+        if data is not None:
+            self.redis_hits += 1
+            if self.should_refresh(load_time, pttl / 1000):
+                await self._refresh(email, payload, loader)
+            self.local.set(email, data)
+            return data
+
+        self.redis_misses += 1
+        token = await self._lock(email)
+        if token is None:
+            payload = await self._wait(key)
+            if payload is not None:
+                data = self.parse(payload)
+                if data is not None:
+                    self.local.set(email, data)
+                    return data
+        try:
+            user, load_time = await self._fetch(loader)
+            if user is None:
+                return None
+            await self.set(user, load_time)
+            return self.parse(self.dump(user))
+        finally:
+            if token is not None:
+                await self._unlock(email, token)
+
+    async def _refresh(self, email: str, payload: bytes, loader: Callable[[], Awaitable[User | None]]):
+        token = await self._lock(email)
+        if token is None:
+            return
+        try:
+            self.early_refreshes += 1
+            user, load_time = await self._fetch(loader)
+            if user is not None:
+                refresh = self.client.register_script(self.REFRESH_SCRIPT)
+                await refresh(
+                    keys=[self.key(email)],
+                    args=[payload, self.dump(user, load_time), self.ttl],
+                )
+        except RedisError as err:
+            logger.warning("User cache refresh failed: %s", err)
+        finally:
+            await self._unlock(email, token)
+
+    async def _lock(self, email: str) -> str | None:
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self.client.set(
+                self.lock_key(email), token, px=int(self.lock_ttl * 1000), nx=True
+            )
+        except RedisError as err:
+            logger.warning("User cache lock failed: %s", err)
+            return token
+        return token if acquired else None
+
+    async def _unlock(self, email: str, token: str):
+        try:
+            unlock = self.client.register_script(self.UNLOCK_SCRIPT)
+            await unlock(keys=[self.lock_key(email)], args=[token])
+        except RedisError as err:
+            logger.warning("User cache unlock failed: %s", err)
+
+    async def _wait(self, key: str) -> bytes | None:
+        # Another worker holds the lock: wait for it to fill the key, at most for the lock TTL
+        self.lock_waits += 1
+        deadline = time.monotonic() + self.lock_ttl
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.LOCK_POLL_INTERVAL)
+            try:
+                payload = await self.client.get(key)
+            except RedisError as err:
+                logger.warning("User cache read failed: %s", err)
+                return None
+            if payload is not None:
+                return payload
+        return None
+
+    async def write(self, user: User):
+        """
+        Write a mutated user through to Redis and drop it from the local tier of every worker.
+
+        :param user: The user after the committed mutation.
+        :type user: User
+        """
+        payload = self.dump(user)
+        self.local.pop(user.email)
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.set(self.key(user.email), payload, ex=self.ttl)
+                pipe.publish(self.CHANNEL, user.email)
+                await pipe.execute()
+        except RedisError as err:
+            logger.warning("User cache write-through failed: %s", err)
+            await self.invalidate(user.email)
+
+    async def invalidate(self, email: str):
+        """
+        Drop a user from Redis and from the local tier of every worker.
+
+        :param email: The user's email.
+        :type email: str
+        """
+        self.local.pop(email)
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.delete(self.key(email))
+                pipe.publish(self.CHANNEL, email)
+                await pipe.execute()
+        except RedisError as err:
+            logger.warning("User cache invalidation failed: %s", err)
+
+    def snapshot(self) -> dict:
+        """
+        Report hit/miss/eviction counters of both tiers.
+
+        :return: The cache counters.
+        :rtype: dict
+        """
+        return {
+            "local": self.local.snapshot(),
+            "redis_hits": self.redis_hits,
+            "redis_misses": self.redis_misses,
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "lock_waits": self.lock_waits,
+            "early_refreshes": self.early_refreshes,
+        }
+
+
+user_cache = UserCache(
+    redis_client,
+    settings.user_cache_ttl,
+    settings.user_cache_local_size,
+    settings.user_cache_local_ttl,
+    settings.user_cache_lock_ttl,
+    settings.user_cache_early_refresh_beta,
+)
+invalidation_bus.subscribe(UserCache.CHANNEL, user_cache.local.pop, user_cache.local.clear)
+registry.register("user_cache", user_cache.snapshot)
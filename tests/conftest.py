@@ -1,13 +1,28 @@
+import asyncio
+
+import fakeredis
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 
 from main import app
 from src.database.models import Base
-from src.database.db import get_db
+from src.database.db import (
+    get_async_db,
+    get_async_read_db,
+    get_async_sessionmaker,
+    get_async_read_sessionmaker,
+)
+from src.services.contacts_cache import contacts_cache
+from src.services.outbox import email_outbox
+from src.services.rate_limit import rate_limiter
+from src.services.refresh_tokens import refresh_token_store
+from src.services.token_versions import token_versions
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+SQLALCHEMY_ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
@@ -15,6 +30,11 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(SQLALCHEMY_ASYNC_DATABASE_URL)
+TestingAsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
 
 @pytest.fixture(scope="module")
 def session():
@@ -24,29 +44,53 @@ def session():
     Base.metadata.create_all(bind=engine)
 
     db=TestingSessionLocal()
-    try: 
+    try:
         yield db
-    finally: 
+    finally:
         db.close()
 
 
 @pytest.fixture(scope="module")
-def client(session):
+def redis_client():
+    client = fakeredis.FakeAsyncRedis()
+    mp = pytest.MonkeyPatch()
+    mp.setattr(refresh_token_store, "client", client)
+    mp.setattr(contacts_cache, "client", client)
+    mp.setattr(rate_limiter, "client", client)
+    mp.setattr(token_versions, "client", client)
+    mp.setattr(email_outbox, "client", client)
+    yield client
+    mp.undo()
+
+
+@pytest.fixture
+def reset_rate_limits(redis_client):
+    async def reset():
+        async for key in redis_client.scan_iter(f"{rate_limiter.PREFIX}:*"):
+            await redis_client.delete(key)
+
+    asyncio.run(reset())
+    rate_limiter.denied.clear()
+
+
+@pytest.fixture(scope="module")
+def client(session, redis_client):
     # Dependency override
 
-    def override_get_db():
-        try:
-            yield session
-        finally:
-            session.close()
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
 
-    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_read_db] = override_get_async_db
+    app.dependency_overrides[get_async_sessionmaker] = lambda: TestingAsyncSessionLocal
+    app.dependency_overrides[get_async_read_sessionmaker] = lambda: TestingAsyncSessionLocal
 
     yield TestClient(app)
 
 
 @pytest.fixture(scope="module")
 def user():
-    return {"username": "oivanko", 
-            "email": "oivanko@testmail.com", 
+    return {"username": "oivanko",
+            "email": "oivanko@testmail.com",
             "password": "647735_Gg"}
@@ -1,11 +1,17 @@
-from unittest.mock import MagicMock
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
 
 from src.database.models import User
+from src.services.outbox import email_outbox
+
 
+pytestmark = pytest.mark.usefixtures("reset_rate_limits")
 
-def test_create_user(client, user, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
+
+def test_create_user(client, user, redis_client):
     response = client.post(
         "/api/auth/signup",
         json=user,
@@ -14,6 +20,12 @@ def test_create_user(client, user, monkeypatch):
     data = response.json()
     assert data["user"]["email"] == user.get("email")
     assert "id" in data["user"]
+    jobs = asyncio.run(redis_client.xrange(email_outbox.stream))
+    assert len(jobs) == 1
+    job = jobs[0][1]
+    assert job[b"kind"] == b"confirm_email"
+    assert job[b"email"] == user.get("email").encode()
+    assert job[b"host"] == b"http://testserver/"
 
 
 def test_repeat_create_user(client, user):
@@ -26,6 +38,17 @@ def test_repeat_create_user(client, user):
     assert data["detail"] == "Account already exists"
 
 
+def test_create_user_when_outbox_is_down(client):
+    user = {"username": "outage", "email": "outage@testmail.com", "password": "647735_Gg"}
+    failing = AsyncMock(side_effect=RedisConnectionError("redis down"))
+    with patch("src.routes.auth.queue_confirmation_email", failing):
+        response = client.post("/api/auth/signup", json=user)
+    assert response.status_code == 201, response.text
+    data = response.json()
+    assert data["user"]["email"] == user["email"]
+    assert "Request a confirmation email" in data["detail"]
+
+
 def test_login_user_not_confirmed(client, user):
     response = client.post(
         "/api/auth/login",
@@ -69,3 +92,97 @@ def test_login_wrong_email(client, user):
     assert response.status_code == 401, response.text
     data = response.json()
     assert data["detail"] == "Invalid email"
+
+
+def login(client, user):
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get("email"), "password": user.get("password")},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def refresh(client, refresh_token):
+    return client.get(
+        "/api/auth/refresh_token",
+        headers={"Authorization": f"Bearer {refresh_token}"},
+    )
+
+
+def test_refresh_token(client, user):
+    tokens = login(client, user)
+    response = refresh(client, tokens["refresh_token"])
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["refresh_token"] != tokens["refresh_token"]
+    response = refresh(client, data["refresh_token"])
+    assert response.status_code == 200, response.text
+
+
+def test_refresh_token_reuse_revokes_family(client, user):
+    tokens = login(client, user)
+    rotated = refresh(client, tokens["refresh_token"]).json()
+    response = refresh(client, tokens["refresh_token"])
+    assert response.status_code == 401, response.text
+    assert response.json()["detail"] == "Invalid refresh token"
+    response = refresh(client, rotated["refresh_token"])
+    assert response.status_code == 401, response.text
+
+
+def test_access_token_is_not_a_refresh_token(client, user):
+    tokens = login(client, user)
+    response = refresh(client, tokens["access_token"])
+    assert response.status_code == 401, response.text
+    assert response.json()["detail"] == "Invalid scope for token"
+
+
+def test_logout(client, user):
+    first = login(client, user)
+    second = login(client, user)
+    response = client.post(
+        "/api/auth/logout",
+        headers={"Authorization": f"Bearer {first['refresh_token']}"},
+    )
+    assert response.status_code == 200, response.text
+    assert refresh(client, first["refresh_token"]).status_code == 401
+    assert refresh(client, second["refresh_token"]).status_code == 200
+
+
+def test_login_rate_limit(client, user):
+    for remaining in range(9, -1, -1):
+        response = client.post(
+            "/api/auth/login",
+            data={"username": user.get("email"), "password": "password"},
+        )
+        assert response.status_code == 401, response.text
+        assert response.headers["ratelimit-limit"] == "10"
+        assert response.headers["ratelimit-remaining"] == str(remaining)
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get("email"), "password": "password"},
+    )
+    assert response.status_code == 429, response.text
+    assert int(response.headers["retry-after"]) >= 1
+    assert response.headers["ratelimit-remaining"] == "0"
+
+
+def test_logout_everywhere_invalidates_access_tokens(client, user):
+    tokens = login(client, user)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    response = client.get("/api/contacts/birthdays/", headers=headers)
+    assert response.status_code == 200, response.text
+    response = client.post(
+        "/api/auth/logout",
+        params={"everywhere": True},
+        headers={"Authorization": f"Bearer {tokens['refresh_token']}"},
+    )
+    assert response.status_code == 200, response.text
+    response = client.get("/api/contacts/birthdays/", headers=headers)
+    assert response.status_code == 401, response.text
+    tokens = login(client, user)
+    response = client.get(
+        "/api/contacts/birthdays/",
+        headers={"Authorization": f"Bearer {tokens['access_token']}"},
+    )
+    assert response.status_code == 200, response.text
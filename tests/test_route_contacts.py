@@ -0,0 +1,205 @@
+import gzip
+import json
+
+import pytest
+
+from main import app
+from src.database.db import get_async_read_db, get_async_read_sessionmaker
+from src.database.models import Contact, User
+from src.services.auth import auth_service
+from src.services.contacts_cache import contacts_cache
+
+
+@pytest.fixture(scope="module")
+def current_user(session):
+    user = User(username="importer", email="importer@testmail.com", password="x", confirmed=True)
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    app.dependency_overrides[auth_service.get_current_principal] = lambda: user
+    yield user
+    app.dependency_overrides.pop(auth_service.get_current_principal)
+
+
+def count_contacts(session, user):
+    session.expire_all()
+    return session.query(Contact).filter(Contact.user_id == user.id).count()
+
+
+def test_import_csv(client, session, current_user):
+    body = (
+        "first_name,last_name,email,phone,birthday,notes\n"
+        "John,Smith,j.smith@example.com,+380501112233,1990-01-31,\n"
+        "Ann,Lee,not-an-email,+380501112233,1991-02-01,note\n"
+        "Kate,Bush,k.bush@example.com,+380501112233,1992-03-02,\"multi\nline\"\n"
+    )
+    response = client.post(
+        "/api/contacts/import",
+        files={"file": ("contacts.csv", body, "text/csv")},
+    )
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["imported"] == 2
+    assert data["failed"] == 1
+    assert data["errors"][0]["row"] == 2
+    assert data["errors"][0]["errors"][0].startswith("email")
+    assert count_contacts(session, current_user) == 2
+
+
+def test_import_ndjson(client, session, current_user):
+    rows = [
+        {"first_name": "Tom", "last_name": "Hanks", "email": "t.hanks@example.com", "birthday": "1956-07-09"},
+        {"first_name": "Meg", "last_name": "Ryan"},
+    ]
+    body = "\n".join(json.dumps(row) for row in rows) + "\n{broken\n"
+    response = client.post(
+        "/api/contacts/import",
+        files={"file": ("contacts.ndjson", body, "application/x-ndjson")},
+    )
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["imported"] == 1
+    assert [error["row"] for error in data["errors"]] == [2, 3]
+    assert count_contacts(session, current_user) == 3
+
+
+def test_import_phone_longer_than_column(client, session, current_user):
+    before = count_contacts(session, current_user)
+    body = (
+        "first_name,last_name,email,phone,birthday,notes\n"
+        "Li,Wei,li.wei@example.com,+86 138 0013 8000,1990-01-31,\n"
+    )
+    response = client.post(
+        "/api/contacts/import",
+        files={"file": ("contacts.csv", body, "text/csv")},
+    )
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert (data["imported"], data["failed"]) == (0, 1)
+    assert data["errors"][0]["errors"][0].startswith("phone")
+    assert count_contacts(session, current_user) == before
+
+
+def test_import_not_utf8(client, session, current_user):
+    body = (
+        "first_name,last_name,email,phone,birthday,notes\n"
+        "José,Ruiz,j.ruiz@example.com,,1990-01-31,\n"
+    )
+    response = client.post(
+        "/api/contacts/import",
+        files={"file": ("contacts.csv", body.encode("latin-1"), "text/csv")},
+    )
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert (data["imported"], data["failed"]) == (0, 1)
+    assert "UTF-8" in data["errors"][0]["errors"][0]
+
+
+def test_import_unsupported_format(client, current_user):
+    response = client.post(
+        "/api/contacts/import",
+        files={"file": ("contacts.xml", "<contacts/>", "application/xml")},
+    )
+    assert response.status_code == 415, response.text
+
+
+def test_export_ndjson(client, current_user):
+    response = client.get("/api/contacts/export", params={"format": "ndjson"})
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["first_name"] for record in records] == ["John", "Kate", "Tom"]
+    assert records[0]["birthday"] == "1990-01-31"
+
+
+def test_export_csv_gzip(client, current_user):
+    response = client.get("/api/contacts/export", params={"gzip": True})
+    assert response.status_code == 200, response.text
+    lines = gzip.decompress(response.content).decode().splitlines()
+    assert lines[0] == "id,first_name,last_name,email,phone,birthday,notes"
+    assert lines[1].split(",")[1] == "John"
+
+
+def test_patch_contact(client, session, current_user):
+    contact = session.query(Contact).filter(Contact.first_name == "Tom").first()
+    response = client.patch(
+        f"/api/contacts/{contact.id}",
+        json={"notes": "Actor", "birthday": "1956-12-31"},
+    )
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["first_name"] == "Tom"
+    assert data["notes"] == "Actor"
+    session.expire_all()
+    assert session.get(Contact, contact.id).birthday_key == 1231
+
+
+def test_patch_contact_not_found(client, current_user):
+    response = client.patch("/api/contacts/9999", json={"notes": "Actor"})
+    assert response.status_code == 404, response.text
+
+
+def test_delete_contact(client, session, current_user):
+    contact = session.query(Contact).filter(Contact.first_name == "Tom").first()
+    response = client.delete(f"/api/contacts/{contact.id}")
+    assert response.status_code == 200, response.text
+    response = client.delete(f"/api/contacts/{contact.id}")
+    assert response.status_code == 404, response.text
+
+
+def test_birthdays_etag(client, session, current_user):
+    response = client.get("/api/contacts/birthdays/", params={"days": 365})
+    assert response.status_code == 200, response.text
+    etag = response.headers["etag"]
+    assert sorted(contact["first_name"] for contact in response.json()) == ["John", "Kate"]
+
+    hits = contacts_cache.hits
+    response = client.get("/api/contacts/birthdays/", params={"days": 365})
+    assert response.headers["etag"] == etag
+    assert contacts_cache.hits == hits + 1
+
+    response = client.get(
+        "/api/contacts/birthdays/", params={"days": 365}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304, response.text
+    assert response.content == b""
+
+    response = client.get(
+        "/api/contacts/birthdays/", params={"days": 30}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200, response.text
+
+
+def test_birthdays_etag_changes_on_update(client, session, current_user):
+    response = client.get("/api/contacts/birthdays/", params={"days": 365})
+    etag = response.headers["etag"]
+    contact = session.query(Contact).filter(Contact.first_name == "John").first()
+    client.patch(f"/api/contacts/{contact.id}", json={"notes": "Updated"})
+    response = client.get(
+        "/api/contacts/birthdays/", params={"days": 365}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200, response.text
+    assert response.headers["etag"] != etag
+    john = next(c for c in response.json() if c["first_name"] == "John")
+    assert john["notes"] == "Updated"
+
+
+def test_cached_reads_fill_from_primary(client, session, current_user):
+    def lagging_replica():
+        raise AssertionError("cached reads must not use a replica")
+
+    overrides = app.dependency_overrides
+    saved = {dep: overrides[dep] for dep in (get_async_read_db, get_async_read_sessionmaker)}
+    overrides[get_async_read_db] = lagging_replica
+    overrides[get_async_read_sessionmaker] = lagging_replica
+    try:
+        contact = session.query(Contact).filter(Contact.first_name == "John").first()
+        client.patch(f"/api/contacts/{contact.id}", json={"notes": "From primary"})
+        response = client.get("/api/contacts/birthdays/", params={"days": 365})
+        assert response.status_code == 200, response.text
+        john = next(c for c in response.json() if c["first_name"] == "John")
+        assert john["notes"] == "From primary"
+        response = client.get("/api/contacts", params={"q": "John"})
+        assert response.status_code == 200, response.text
+    finally:
+        overrides.update(saved)
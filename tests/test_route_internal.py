@@ -0,0 +1,22 @@
+from src.conf.config import settings
+
+
+def test_internal_disabled_without_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "internal_token", "")
+    response = client.get("/api/internal/metrics", headers={"X-Internal-Token": ""})
+    assert response.status_code == 404, response.text
+
+
+def test_internal_requires_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "internal_token", "s3cret")
+    response = client.get("/api/internal/metrics")
+    assert response.status_code == 403, response.text
+    response = client.get("/api/internal/pool", headers={"X-Internal-Token": "wrong"})
+    assert response.status_code == 403, response.text
+
+
+def test_internal_with_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "internal_token", "s3cret")
+    response = client.get("/api/internal/pool", headers={"X-Internal-Token": "s3cret"})
+    assert response.status_code == 200, response.text
+    assert "db_pool" in response.json()
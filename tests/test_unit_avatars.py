@@ -0,0 +1,282 @@
+import io
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import fakeredis
+from fastapi import HTTPException, UploadFile
+from PIL import ExifTags, Image
+from starlette.datastructures import Headers
+
+from src.database.models import User
+from src.services.avatars import (
+    AvatarPipeline,
+    AvatarStorage,
+    InvalidAvatar,
+    LocalStorage,
+    prepare_avatar,
+    sniff,
+)
+from src.services.outbox import Outbox
+
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+
+def encode(image: Image.Image, fmt: str, **params) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **params)
+    return buffer.getvalue()
+
+
+def halves(width: int, height: int) -> Image.Image:
+    # Left half red, right half blue
+    image = Image.new("RGB", (width, height), "blue")
+    image.paste("red", (0, 0, width // 2, height))
+    return image
+
+
+class TestPrepareAvatar(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, data: bytes) -> Path:
+        path = Path(self.tmp.name) / "upload"
+        path.write_bytes(data)
+        return path
+
+    def prepare(self, data: bytes, **params) -> Image.Image:
+        avatar = prepare_avatar(self.write(data), 250, **params)
+        return Image.open(io.BytesIO(avatar))
+
+    def test_scales_to_a_square_jpeg(self):
+        avatar = self.prepare(encode(halves(2000, 1000), "JPEG"))
+        self.assertEqual(avatar.format, "JPEG")
+        self.assertEqual(avatar.size, (250, 250))
+        self.assertEqual(avatar.mode, "RGB")
+
+    def test_large_jpeg_is_decoded_in_draft_mode(self):
+        resize = Image.Image.resize
+        with patch.object(Image.Image, "resize", autospec=True, side_effect=resize) as spy:
+            self.prepare(encode(halves(4000, 3000), "JPEG"))
+        # Decoded at 1/8 scale, the smallest that still covers 250x250
+        self.assertEqual(spy.call_args.args[0].size, (500, 375))
+
+    def test_applies_exif_orientation(self):
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = 6
+        avatar = self.prepare(encode(halves(600, 300), "JPEG", exif=exif)).convert("RGB")
+        top, bottom = avatar.getpixel((125, 20)), avatar.getpixel((125, 230))
+        self.assertGreater(top[0], 200)
+        self.assertGreater(bottom[2], 200)
+
+    def test_transparency_becomes_white(self):
+        avatar = self.prepare(encode(Image.new("RGBA", (300, 300), (0, 0, 0, 0)), "PNG"))
+        self.assertEqual(avatar.convert("RGB").getpixel((125, 125)), (255, 255, 255))
+
+    def test_same_image_encodes_identically(self):
+        data = encode(halves(800, 600), "PNG")
+        self.assertEqual(
+            prepare_avatar(self.write(data), 250), prepare_avatar(self.write(data), 250)
+        )
+
+    def test_rejects_invalid_and_oversized_images(self):
+        with self.assertRaises(InvalidAvatar):
+            self.prepare(PNG)
+        with self.assertRaises(InvalidAvatar):
+            self.prepare(encode(halves(1000, 1000), "JPEG"), max_pixels=999999)
+
+
+class TestAvatarStorage(unittest.TestCase):
+
+    def test_incomplete_backend_cannot_be_created(self):
+        class UploadOnly(AvatarStorage):
+            async def save(self, key, path, content_type):
+                return f"/avatars/{key}"
+
+        with self.assertRaises(TypeError):
+            UploadOnly()
+
+
+class TestLocalStorage(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        self.storage = LocalStorage(self.root / "a" / "b", "/static/avatars")
+        self.source = self.root / "avatar"
+        self.source.write_bytes(b"avatar")
+
+    async def test_save_and_delete(self):
+        url = await self.storage.save("1-abc", self.source, "image/jpeg")
+        self.assertEqual(url, "/static/avatars/1-abc.jpg")
+        self.assertEqual((self.storage.root / "1-abc.jpg").read_bytes(), b"avatar")
+        await self.storage.delete("1-abc")
+        self.assertEqual(list(self.storage.root.iterdir()), [])
+
+    async def test_rejects_keys_outside_root(self):
+        for key in ("../../pwn", "../x", "/tmp/pwn", "sub/x"):
+            with self.subTest(key=key), self.assertRaises(ValueError):
+                await self.storage.save(key, self.source, "image/jpeg")
+            with self.subTest(key=key), self.assertRaises(ValueError):
+                await self.storage.delete(key)
+        self.assertEqual([p.name for p in self.root.rglob("*")], ["avatar"])
+
+
+def upload(data: bytes, content_type: str) -> UploadFile:
+    return UploadFile(
+        io.BytesIO(data), filename="avatar", headers=Headers({"content-type": content_type})
+    )
+
+
+class TestAvatarPipeline(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        root = Path(self.tmp.name)
+        self.redis = fakeredis.FakeAsyncRedis()
+        self.outbox = Outbox(self.redis, "avatars", "workers", "avatars:dead")
+        self.storage = LocalStorage(root / "public", "/static/avatars")
+        self.session = AsyncMock()
+        self.pipeline = AvatarPipeline(
+            self.storage,
+            self.outbox,
+            root / "spool",
+            max_size=1024,
+            content_types=["image/png", "image/jpeg"],
+            session_factory=MagicMock(return_value=self.session),
+        )
+        self.user = User(id=1, username="oivanko", email="oivanko@testmail.com")
+
+    def spooled(self) -> list:
+        return list(self.pipeline.spool_dir.iterdir())
+
+    async def test_sniff(self):
+        self.assertTrue(sniff(PNG, "image/png"))
+        self.assertTrue(sniff(b"\xff\xd8\xff\xe0", "image/jpeg"))
+        self.assertTrue(sniff(b"RIFF\x00\x00\x00\x00WEBPVP8 ", "image/webp"))
+        self.assertFalse(sniff(b"RIFF\x00\x00\x00\x00WAVEfmt ", "image/webp"))
+        self.assertFalse(sniff(PNG, "image/jpeg"))
+
+    async def test_accept_spools_and_queues(self):
+        entry_id = await self.pipeline.accept(upload(PNG, "image/png"), self.user)
+        entries = await self.redis.xrange("avatars")
+        self.assertEqual(entries[0][0].decode(), entry_id)
+        fields = {k.decode(): v.decode() for k, v in entries[0][1].items()}
+        self.assertEqual(fields["kind"], "update_avatar")
+        self.assertEqual(fields["email"], "oivanko@testmail.com")
+        self.assertEqual(fields["key"], "1")
+        self.assertEqual(fields["content_type"], "image/png")
+        self.assertEqual(Path(fields["path"]).read_bytes(), PNG)
+
+    async def test_unsupported_content_type(self):
+        with self.assertRaises(HTTPException) as err:
+            await self.pipeline.accept(upload(b"GIF89a", "image/gif"), self.user)
+        self.assertEqual(err.exception.status_code, 415)
+        self.assertEqual(await self.redis.exists("avatars"), 0)
+
+    async def test_content_not_matching_type(self):
+        with self.assertRaises(HTTPException) as err:
+            await self.pipeline.accept(upload(b"<svg></svg>", "image/png"), self.user)
+        self.assertEqual(err.exception.status_code, 415)
+        self.assertEqual(self.spooled(), [])
+
+    async def test_too_large(self):
+        with patch("src.services.avatars.CHUNK_SIZE", 256):
+            with self.assertRaises(HTTPException) as err:
+                await self.pipeline.accept(upload(PNG + b"\x00" * 2000, "image/png"), self.user)
+        self.assertEqual(err.exception.status_code, 413)
+        self.assertEqual(self.spooled(), [])
+        self.assertEqual(await self.redis.exists("avatars"), 0)
+
+    async def run_job(self, data: bytes) -> AsyncMock:
+        await self.pipeline.accept(upload(data, "image/jpeg"), self.user)
+        _, fields = (await self.redis.xrange("avatars"))[-1]
+        job = {k.decode(): v.decode() for k, v in fields.items() if k != b"kind"}
+        with patch("src.services.avatars.repository_users") as repository_users:
+            repository_users.get_user_by_email = AsyncMock(return_value=self.user)
+            repository_users.update_avatar = AsyncMock()
+            await self.pipeline.process(**job)
+        if repository_users.update_avatar.await_count:
+            self.user.avatar = repository_users.update_avatar.await_args.args[1]
+        return repository_users.update_avatar
+
+    def stored(self) -> list:
+        return sorted(path.name for path in self.storage.root.iterdir())
+
+    async def test_process_stores_and_updates_user(self):
+        self.pipeline.max_size = 10 ** 6
+        update_avatar = await self.run_job(encode(halves(1200, 900), "JPEG"))
+        url = update_avatar.await_args.args[1]
+        self.assertRegex(url, r"^/static/avatars/1-[0-9a-f]{32}\.jpg$")
+        update_avatar.assert_awaited_once_with(
+            "oivanko@testmail.com", url, self.session.__aenter__.return_value
+        )
+        self.assertEqual(Image.open(self.storage.root / url.rsplit("/", 1)[1]).size, (250, 250))
+        self.assertEqual(self.spooled(), [])
+        self.assertEqual(self.pipeline.snapshot(), {"stored": 1, "unchanged": 0, "rejected": 0})
+
+    async def test_process_skips_unchanged_avatar(self):
+        self.pipeline.max_size = 10 ** 6
+        data = encode(halves(1200, 900), "JPEG")
+        await self.run_job(data)
+        stored = self.stored()
+        update_avatar = await self.run_job(data)
+        update_avatar.assert_not_awaited()
+        self.assertEqual(self.stored(), stored)
+        self.assertEqual(self.spooled(), [])
+        self.assertEqual(self.pipeline.snapshot(), {"stored": 1, "unchanged": 1, "rejected": 0})
+
+    async def test_process_replaces_previous_avatar(self):
+        self.pipeline.max_size = 10 ** 6
+        await self.run_job(encode(halves(1200, 900), "JPEG"))
+        first = self.stored()
+        await self.run_job(encode(halves(900, 1200), "JPEG"))
+        second = self.stored()
+        self.assertEqual(len(second), 1)
+        self.assertNotEqual(first, second)
+        self.assertIn(second[0].split(".")[0], self.user.avatar)
+
+    async def test_process_drops_undecodable_image(self):
+        update_avatar = await self.run_job(b"\xff\xd8\xff" + b"\x00" * 100)
+        update_avatar.assert_not_awaited()
+        self.assertEqual(self.spooled(), [])
+        self.assertEqual(self.pipeline.snapshot()["rejected"], 1)
+
+    async def test_same_username_does_not_share_avatars(self):
+        self.pipeline.max_size = 10 ** 6
+        data = encode(halves(1200, 900), "JPEG")
+        await self.run_job(data)
+        first = self.user.avatar
+        self.user = User(id=2, username="oivanko", email="other@testmail.com")
+        await self.run_job(data)
+        self.assertNotEqual(self.user.avatar, first)
+        await self.run_job(encode(halves(900, 1200), "JPEG"))
+        self.assertIn(first.rsplit("/", 1)[1], self.stored())
+
+    def test_stored_key(self):
+        key = "12-" + "a" * 32
+        self.assertEqual(AvatarPipeline.stored_key("12", f"/static/avatars/{key}.jpg"), key)
+        url = f"https://res.cloudinary.com/x/image/upload/v1/RestApiApp/{key}"
+        self.assertEqual(AvatarPipeline.stored_key("12", url), key)
+        self.assertIsNone(AvatarPipeline.stored_key("2", f"/static/avatars/{key}.jpg"))
+        self.assertIsNone(AvatarPipeline.stored_key("12", "https://gravatar.com/avatar/x"))
+        self.assertIsNone(AvatarPipeline.stored_key("12", None))
+
+    async def test_process_skips_missing_spool_file(self):
+        with patch(
+            "src.services.avatars.repository_users.update_avatar", new_callable=AsyncMock
+        ) as update_avatar:
+            await self.pipeline.process(
+                "oivanko@testmail.com", "1", str(self.pipeline.spool_dir / "gone"), "image/png"
+            )
+        update_avatar.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    unittest.main()
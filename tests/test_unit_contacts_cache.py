@@ -0,0 +1,50 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+import fakeredis
+from redis.exceptions import ConnectionError
+
+from src.services.contacts_cache import ContactsCache
+
+
+class TestContactsCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeAsyncRedis()
+        self.cache = ContactsCache(self.redis, ttl=60)
+
+    async def test_version_starts_from_clock(self):
+        version = await self.cache.version(1)
+        self.assertGreater(version, 10**18)
+        self.assertEqual(await self.cache.version(1), version)
+
+    async def test_bump(self):
+        version = await self.cache.version(1)
+        await self.cache.bump(1)
+        self.assertEqual(await self.cache.version(1), version + 1)
+        self.assertGreater(await self.cache.version(2), version)
+
+    async def test_lost_counter_does_not_reuse_versions(self):
+        await self.cache.bump(1)
+        version = await self.cache.version(1)
+        await self.redis.delete(ContactsCache.version_key(1))
+        await self.cache.bump(1)
+        self.assertGreater(await self.cache.version(1), version)
+
+    async def test_key_depends_on_version_and_params(self):
+        key = self.cache.key(1, 5, "page", {"q": None, "limit": 50})
+        self.assertEqual(key, self.cache.key(1, 5, "page", {"limit": 50, "q": None}))
+        self.assertNotEqual(key, self.cache.key(1, 6, "page", {"q": None, "limit": 50}))
+        self.assertNotEqual(key, self.cache.key(1, 5, "page", {"q": "a", "limit": 50}))
+
+    async def test_redis_down_disables_cache(self):
+        client = MagicMock()
+        pipe = MagicMock(execute=AsyncMock(side_effect=ConnectionError()))
+        client.pipeline.return_value.__aenter__.return_value = pipe
+        cache = ContactsCache(client, ttl=60)
+        self.assertIsNone(await cache.version(1))
+        await cache.bump(1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import time
+import unittest
+
+from fastapi import HTTPException
+
+from src.services.hashing import PasswordHasher
+
+
+class TestPasswordHasher(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.hasher = PasswordHasher(workers=2, max_pending=4, timeout=5)
+
+    def tearDown(self):
+        self.hasher.shutdown()
+
+    async def test_hash_and_verify(self):
+        hashed = await self.hasher.hash("647735_Gg")
+        self.assertTrue(await self.hasher.verify("647735_Gg", hashed))
+        self.assertFalse(await self.hasher.verify("password", hashed))
+        snapshot = self.hasher.snapshot()
+        self.assertEqual(snapshot["hash_seconds"]["count"], 3)
+        self.assertEqual(snapshot["queue_wait_seconds"]["count"], 3)
+        self.assertEqual(snapshot["pending"], 0)
+
+    async def test_reject_when_queue_is_full(self):
+        self.hasher.max_pending = 0
+        with self.assertRaises(HTTPException) as context:
+            await self.hasher.hash("647735_Gg")
+        self.assertEqual(context.exception.status_code, 503)
+        self.assertEqual(self.hasher.snapshot()["rejected"], 1)
+
+    async def test_timeout(self):
+        self.hasher.timeout = 0.01
+        with self.assertRaises(HTTPException) as context:
+            await self.hasher.run(time.sleep, 0.2)
+        self.assertEqual(context.exception.status_code, 503)
+        self.assertEqual(self.hasher.snapshot()["timeouts"], 1)
+        self.assertEqual(self.hasher.pending, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock
+
+import fakeredis
+
+from src.services.invalidation import InvalidationBus
+
+
+class TestInvalidationBus(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.redis = fakeredis.FakeAsyncRedis()
+        self.bus = InvalidationBus(self.redis)
+        self.evicted = []
+        self.reset = MagicMock()
+        self.bus.subscribe("versions", lambda data: self.evicted.append(int(data)), self.reset)
+
+    async def asyncTearDown(self):
+        await self.bus.stop()
+
+    async def publish(self, data: str):
+        await self.redis.publish("versions", data)
+        await asyncio.sleep(0.05)
+
+    async def test_messages_are_dispatched(self):
+        self.bus.start()
+        await asyncio.sleep(0.05)
+        self.reset.assert_called_once()
+        await self.publish("7")
+        self.assertEqual(self.evicted, [7])
+
+    async def test_failing_handler_does_not_stop_the_listener(self):
+        self.bus.start()
+        await asyncio.sleep(0.05)
+        with self.assertLogs("src.services.invalidation", "ERROR"):
+            await self.publish("not a number")
+        self.assertEqual(self.reset.call_count, 2)
+        self.assertFalse(self.bus._listener.done())
+        await self.publish("8")
+        self.assertEqual(self.evicted, [8])
+
+
+if __name__ == "__main__":
+    unittest.main()
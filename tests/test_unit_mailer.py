@@ -0,0 +1,119 @@
+import asyncio
+import socket
+import unittest
+
+from aiosmtpd.controller import Controller
+
+from src.services.email import build_message
+from src.services.mailer import Mailer, SMTPPool
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Recorder:
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        self.messages.append(envelope)
+        return "250 OK"
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("reject"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+
+class TestMailer(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.port = free_port()
+        self.handler = Recorder()
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=self.port)
+        self.controller.start()
+        self.addCleanup(lambda: self.controller.stop())
+
+    def make_mailer(self, **kwargs) -> Mailer:
+        options = {"rate": 0, "batch_size": 50, "batch_window": 0.01}
+        options.update(kwargs)
+        pool = SMTPPool("127.0.0.1", self.port, use_tls=False, size=1, max_idle=60)
+        return Mailer(pool, **options)
+
+    def message(self, recipient: str = "oivanko@testmail.com"):
+        return build_message(recipient, "Confirm your email", "<p>Hi</p>")
+
+    async def test_batch_uses_one_connection(self):
+        mailer = self.make_mailer()
+        await asyncio.gather(*(mailer.send(self.message()) for _ in range(10)))
+        await mailer.stop()
+        self.assertEqual(len(self.handler.messages), 10)
+        self.assertEqual(len(self.handler.sessions), 1)
+        self.assertEqual(mailer.pool.connects, 1)
+        self.assertEqual(mailer.snapshot()["sent"], 10)
+
+    async def test_connection_is_kept_between_batches(self):
+        mailer = self.make_mailer()
+        await mailer.send(self.message())
+        await mailer.send(self.message())
+        await mailer.stop()
+        self.assertEqual(mailer.pool.connects, 1)
+
+    async def test_reconnects_after_server_restart(self):
+        mailer = self.make_mailer()
+        await mailer.send(self.message())
+        self.controller.stop()
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=self.port)
+        self.controller.start()
+        await mailer.send(self.message())
+        await mailer.stop()
+        self.assertEqual(len(self.handler.messages), 2)
+        self.assertEqual(mailer.pool.reconnects, 1)
+
+    async def test_idle_connection_is_replaced(self):
+        mailer = self.make_mailer()
+        mailer.pool.max_idle = 0
+        await mailer.send(self.message())
+        await mailer.send(self.message())
+        await mailer.stop()
+        self.assertEqual(mailer.pool.connects, 2)
+
+    async def test_rejected_message_fails_alone(self):
+        mailer = self.make_mailer()
+        results = await asyncio.gather(
+            mailer.send(self.message()),
+            mailer.send(self.message("reject@testmail.com")),
+            mailer.send(self.message()),
+            return_exceptions=True,
+        )
+        await mailer.stop()
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], Exception)
+        self.assertIsNone(results[2])
+        self.assertEqual(mailer.failed, 1)
+
+    async def test_send_rate(self):
+        mailer = self.make_mailer(rate=50)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(mailer.send(self.message()) for _ in range(6)))
+        await mailer.stop()
+        self.assertGreaterEqual(loop.time() - started, 0.09)
+
+    async def test_unreachable_server_fails_messages(self):
+        pool = SMTPPool("127.0.0.1", free_port(), use_tls=False, size=1, timeout=1)
+        mailer = Mailer(pool, rate=0, batch_window=0.01)
+        with self.assertRaises(OSError):
+            await mailer.send(self.message())
+        await mailer.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import QueuePool
+
+from src.services.metrics import Histogram, PoolStats
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_observe(self):
+        histogram = Histogram(buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 5):
+            histogram.observe(value)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["buckets"], {"le_0.1": 1, "le_1": 3, "le_inf": 4})
+        self.assertEqual(snapshot["count"], 4)
+        self.assertAlmostEqual(snapshot["sum"], 6.05)
+
+
+class TestPoolStats(unittest.TestCase):
+
+    def setUp(self):
+        self.stats = PoolStats()
+        self.engine = create_engine(
+            "sqlite://",
+            poolclass=self.stats.instrument(QueuePool),
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.01,
+        )
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def test_checkout_counts(self):
+        with self.engine.connect():
+            snapshot = self.stats.snapshot()
+            self.assertEqual(snapshot["checked_out"], 1)
+            self.assertEqual(snapshot["size"], 1)
+        snapshot = self.stats.snapshot()
+        self.assertEqual(snapshot["checked_out"], 0)
+        self.assertEqual(snapshot["wait_seconds"]["count"], 1)
+
+    def test_timeout_is_counted(self):
+        with self.engine.connect():
+            with self.assertRaises(exc.TimeoutError):
+                self.engine.connect()
+        self.assertEqual(self.stats.snapshot()["timeouts"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+
+from src.database.models import Base
+
+
+def indexed_columns(table_name: str) -> list:
+    table = Base.metadata.tables[table_name]
+    indexes = [tuple(column.name for column in index.columns) for index in table.indexes]
+    indexes += [
+        tuple(column.name for column in constraint.columns)
+        for constraint in table.constraints
+        if constraint.__class__.__name__ in ("PrimaryKeyConstraint", "UniqueConstraint")
+    ]
+    return indexes
+
+
+class TestIndexes(unittest.TestCase):
+
+    def test_contacts_user_id_is_indexed(self):
+        self.assertIn(("user_id", "id"), indexed_columns("contacts"))
+
+    def test_contacts_birthday_key_is_indexed(self):
+        self.assertIn(("user_id", "birthday_key"), indexed_columns("contacts"))
+
+    def test_every_foreign_key_is_leading_column_of_an_index(self):
+        for table in Base.metadata.sorted_tables:
+            leading = {columns[0] for columns in indexed_columns(table.name) if columns}
+            for foreign_key in table.foreign_keys:
+                self.assertIn(foreign_key.parent.name, leading, f"{table.name}.{foreign_key.parent.name}")
+
+    def test_users_email_is_unique(self):
+        self.assertIn(("email",), indexed_columns("users"))
+
+
+if __name__ == "__main__":
+    unittest.main()
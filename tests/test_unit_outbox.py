@@ -0,0 +1,100 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import fakeredis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from src.services.outbox import Outbox
+
+
+class TestOutbox(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.redis = fakeredis.FakeAsyncRedis()
+        self.outbox = Outbox(
+            self.redis, "jobs", "workers", "jobs:dead", max_attempts=3, backoff=0.02
+        )
+        self.handler = AsyncMock()
+        self.outbox.handler("greet")(self.handler)
+        await self.outbox.ensure_group()
+
+    async def pending(self) -> int:
+        return (await self.redis.xpending("jobs", "workers"))["pending"]
+
+    async def test_job_is_handled_and_acknowledged(self):
+        await self.outbox.enqueue("greet", email="oivanko@testmail.com", username="oivanko")
+        self.assertEqual(await self.outbox.run_once("a", block=10), 1)
+        self.handler.assert_awaited_once_with(email="oivanko@testmail.com", username="oivanko")
+        self.assertEqual(await self.pending(), 0)
+
+    async def test_ensure_group_is_idempotent(self):
+        await self.outbox.ensure_group()
+
+    async def test_failed_job_is_retried_after_backoff(self):
+        self.handler.side_effect = [ConnectionError("smtp down"), None]
+        await self.outbox.enqueue("greet", email="oivanko@testmail.com")
+        await self.outbox.run_once("a", block=10)
+        self.assertEqual(await self.pending(), 1)
+        self.assertEqual(await self.outbox.run_once("a", block=1), 0)
+        await asyncio.sleep(0.03)
+        self.assertEqual(await self.outbox.run_once("a", block=1), 1)
+        self.assertEqual(self.handler.await_count, 2)
+        self.assertEqual(await self.pending(), 0)
+        self.assertEqual(self.outbox.snapshot(), {"processed": 1, "retried": 1, "dead": 0})
+
+    async def test_job_is_dead_lettered_after_max_attempts(self):
+        self.handler.side_effect = ConnectionError("smtp down")
+        await self.outbox.enqueue("greet", email="oivanko@testmail.com")
+        await self.outbox.run_once("a", block=10)
+        for delay in (0.03, 0.05):
+            await asyncio.sleep(delay)
+            await self.outbox.run_once("a", block=1)
+        self.assertEqual(self.handler.await_count, 3)
+        self.assertEqual(await self.pending(), 0)
+        [(_, dead)] = await self.redis.xrange("jobs:dead")
+        self.assertEqual(dead[b"kind"], b"greet")
+        self.assertEqual(dead[b"email"], b"oivanko@testmail.com")
+        self.assertEqual(dead[b"attempts"], b"3")
+        self.assertIn(b"smtp down", dead[b"error"])
+
+    async def test_unknown_job_is_dead_lettered(self):
+        await self.outbox.enqueue("unknown", email="oivanko@testmail.com")
+        await self.outbox.run_once("a", block=10)
+        self.assertEqual(await self.redis.xlen("jobs:dead"), 1)
+        self.assertEqual(await self.pending(), 0)
+
+    async def test_jobs_of_a_dead_worker_are_claimed(self):
+        await self.outbox.enqueue("greet", email="oivanko@testmail.com")
+        await self.outbox.read_new("crashed", count=10, block=10)
+        await asyncio.sleep(0.03)
+        self.assertEqual(await self.outbox.run_once("b", block=1), 1)
+        self.handler.assert_awaited_once()
+        self.assertEqual(await self.pending(), 0)
+
+    async def test_run_survives_redis_errors(self):
+        xreadgroup = self.redis.xreadgroup
+        failures = [RedisConnectionError("connection reset"), None, RedisConnectionError("timeout")]
+
+        async def flaky(*args, **kwargs):
+            if failures and failures.pop(0):
+                raise RedisConnectionError("connection reset")
+            return await xreadgroup(*args, **kwargs)
+
+        await self.outbox.enqueue("greet", email="oivanko@testmail.com")
+        with patch.object(self.redis, "xreadgroup", side_effect=flaky):
+            runner = asyncio.create_task(self.outbox.run("a"))
+            try:
+                await asyncio.sleep(0.2)
+                self.assertFalse(runner.done())
+                await self.outbox.enqueue("greet", email="other@testmail.com")
+                await asyncio.sleep(0.1)
+            finally:
+                runner.cancel()
+        self.assertEqual(self.handler.await_count, 2)
+        self.assertEqual(failures, [])
+        self.assertEqual(await self.pending(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
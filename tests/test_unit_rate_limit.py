@@ -0,0 +1,48 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import fakeredis
+from redis.exceptions import ConnectionError
+
+from src.services.rate_limit import RateLimiter
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeAsyncRedis()
+        self.limiter = RateLimiter(self.redis, local_size=100)
+
+    async def test_allows_limit_then_denies(self):
+        results = [await self.limiter.hit("test", "client", 3, 60) for _ in range(4)]
+        self.assertEqual([result.allowed for result in results], [True, True, True, False])
+        self.assertEqual([result.remaining for result in results], [2, 1, 0, 0])
+        # Requests are spread over the window: the next one is allowed after 60 / 3 s
+        self.assertAlmostEqual(results[3].retry_after, 20, delta=0.1)
+        self.assertAlmostEqual(results[3].reset, 60, delta=0.1)
+        self.assertEqual(results[3].headers()["Retry-After"], "20")
+
+    async def test_denied_key_is_rejected_locally(self):
+        for _ in range(2):
+            await self.limiter.hit("test", "client", 1, 60)
+        with patch.object(RateLimiter, "script", new=AsyncMock()) as script:
+            result = await self.limiter.hit("test", "client", 1, 60)
+        self.assertFalse(result.allowed)
+        script.assert_not_awaited()
+        self.assertEqual(self.limiter.local_denied_count, 1)
+
+    async def test_policies_and_identities_are_separate(self):
+        await self.limiter.hit("test", "client", 1, 60)
+        self.assertTrue((await self.limiter.hit("test", "other", 1, 60)).allowed)
+        self.assertTrue((await self.limiter.hit("other", "client", 1, 60)).allowed)
+
+    async def test_redis_down_lets_requests_through(self):
+        client = MagicMock()
+        client.register_script.return_value = AsyncMock(side_effect=ConnectionError())
+        limiter = RateLimiter(client, local_size=100)
+        self.assertIsNone(await limiter.hit("test", "client", 1, 60))
+        self.assertEqual(limiter.errors, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from src.database.replicas import Replica, ReplicaRouter
+
+
+class TestReplicaRouter(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engines = []
+        self.primary = await self.make_node("primary")
+        self.replica = Replica("replica", await self.make_node("replica"))
+        self.router = ReplicaRouter(self.primary, [self.replica], retry_after=60)
+
+    async def asyncTearDown(self):
+        for engine in self.engines:
+            await engine.dispose()
+        self.tmp.cleanup()
+
+    async def make_node(self, name: str, path: str = None) -> async_sessionmaker:
+        path = path or os.path.join(self.tmp.name, f"{name}.db")
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        self.engines.append(engine)
+        if os.path.isdir(os.path.dirname(path)):
+            async with engine.begin() as conn:
+                await conn.execute(text("CREATE TABLE node (name TEXT)"))
+                await conn.execute(text("INSERT INTO node VALUES (:name)"), {"name": name})
+        return async_sessionmaker(engine)
+
+    async def read_node(self) -> str:
+        db = await self.router.open_session()
+        try:
+            return (await db.execute(text("SELECT name FROM node"))).scalar_one()
+        finally:
+            await db.close()
+
+    async def test_reads_go_to_replica(self):
+        self.assertEqual(await self.read_node(), "replica")
+        self.assertEqual(await self.read_node(), "replica")
+
+    async def test_round_robin(self):
+        second = Replica("second", await self.make_node("second"))
+        self.router.replicas.append(second)
+        self.assertEqual([await self.read_node() for _ in range(4)], ["replica", "second"] * 2)
+
+    async def test_fallback_to_primary_when_replica_is_down(self):
+        broken = Replica("broken", await self.make_node("broken", "/nonexistent/dir/broken.db"))
+        self.router.replicas = [broken]
+        self.assertEqual(await self.read_node(), "primary")
+        self.assertFalse(broken.healthy)
+        self.assertEqual(self.router.snapshot()["broken"], {"healthy": False, "failures": 1})
+        self.assertIs(self.router.choose(), self.primary)
+
+    async def test_replica_returns_after_retry_period(self):
+        self.router.mark_down(self.replica)
+        self.assertEqual(await self.read_node(), "primary")
+        self.replica.down_until = 0
+        self.assertEqual(await self.read_node(), "replica")
+
+
+if __name__ == "__main__":
+    unittest.main()
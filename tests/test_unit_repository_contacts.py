@@ -5,9 +5,9 @@ from datetime import date
 from fastapi import HTTPException
 
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 load_dotenv()
@@ -21,19 +21,43 @@ from src.repository.contacts import (
     delete_contact,
     update_contact,
     get_future_birthdays,
+    decode_cursor,
+    encode_cursor,
 )
 
 class TestContacts(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = AsyncMock(spec=AsyncSession)
+        self.result = MagicMock()
+        self.session.execute.return_value = self.result
+        patcher = patch("src.repository.contacts.contacts_cache", AsyncMock())
+        self.contacts_cache = patcher.start()
+        self.addCleanup(patcher.stop)
         self.user = User(id=1)
 
     async def test_read_contacts_all(self):
         contacts = [Contact(), Contact(), Contact()]
-        self.session.query().filter().all.return_value = contacts
+        self.result.scalars().all.return_value = contacts
         result = await read_contacts(user=self.user, db=self.session)
-        self.assertEqual(result, contacts)
+        self.assertEqual(result["items"], contacts)
+        self.assertIsNone(result["next_cursor"])
+
+    async def test_read_contacts_next_page(self):
+        contacts = [Contact(id=1), Contact(id=2), Contact(id=3)]
+        self.result.scalars().all.return_value = contacts
+        result = await read_contacts(user=self.user, db=self.session, limit=2)
+        self.assertEqual(result["items"], contacts[:2])
+        self.assertEqual(decode_cursor(result["next_cursor"]), {"id": 2})
+
+    async def test_ranked_cursor(self):
+        cursor = encode_cursor(Contact(id=3), rank=0.5)
+        self.assertEqual(decode_cursor(cursor), {"id": 3, "rank": 0.5})
+
+    async def test_read_contacts_invalid_cursor(self):
+        with self.assertRaises(HTTPException) as context:
+            await read_contacts(user=self.user, db=self.session, cursor="not a cursor")
+        self.assertEqual(context.exception.status_code, 400)
 
     async def test_read_contacts_with_query(self):
         query = "John"
@@ -42,18 +66,18 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             Contact(first_name="John", last_name="Lewis"),
             Contact(first_name="John", last_name="Smith"),
         ]
-        self.session.query().filter().all.return_value = contacts
+        self.result.scalars().all.return_value = contacts
         result = await read_contacts(q=query, user=self.user, db=self.session)
-        self.assertEqual(result, contacts)
+        self.assertEqual(result["items"], contacts)
 
     async def test_find_contact_found(self):
         contact = Contact()
-        self.session.query().filter().first.return_value = contact
+        self.result.scalar_one_or_none.return_value = contact
         result = await find_contact(contact_id=1, user = self.user, db = self.session)
         self.assertEqual(result, contact)
 
     async def test_find_contact_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.result.scalar_one_or_none.return_value = None
         with self.assertRaises(HTTPException) as context: 
             await find_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(context.exception.status_code, 404)
@@ -76,15 +100,16 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(new_contact.birthday, result_contact.birthday)
         self.assertEqual(new_contact.notes, result_contact.notes)
         self.assertTrue(hasattr(result_contact, "id"))
+        self.contacts_cache.bump.assert_awaited_once_with(self.user.id)
 
     async def test_remove_contact_found(self):
-        contact = Contact()
-        self.session.query().filter().first.return_value = contact
+        self.result.scalar_one_or_none.return_value = 1
         result = await delete_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(result, {"message": "Contact successfully deleted"})
+        self.contacts_cache.bump.assert_awaited_once_with(self.user.id)
 
     async def test_remove_contact_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.result.scalar_one_or_none.return_value = None
         with self.assertRaises(HTTPException) as context:
             await delete_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(context.exception.status_code, 404)
@@ -98,7 +123,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             birthday= date.today(),
             notes="New note",
         )
-        self.session.query().filter().first.return_value = Contact()
+        self.result.scalar_one_or_none.return_value = Contact()
         result_contact = await update_contact(
             contact_id=1,
             user=self.user,
@@ -106,6 +131,17 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             db=self.session,
         )
         self.assertIsInstance(result_contact, Contact)
+        self.session.commit.assert_awaited_once()
+
+    async def test_update_contact_nothing_set(self):
+        contact = Contact()
+        self.result.scalar_one_or_none.return_value = contact
+        result_contact = await update_contact(
+            contact_id=1, user=self.user, contact=ContactUpdate(), db=self.session
+        )
+        self.assertEqual(result_contact, contact)
+        self.session.commit.assert_not_awaited()
+        self.contacts_cache.bump.assert_not_awaited()
 
 
     async def test_update_contact_not_found(self):
@@ -117,7 +153,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             birthday=date.today(),
             notes="New note",
         )
-        self.session.query().filter().first.return_value = None
+        self.result.scalar_one_or_none.return_value = None
         self.session.commit.return_value = None
         with self.assertRaises(HTTPException) as context: 
             await update_contact(
@@ -127,14 +163,27 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             db=self.session,
         )
         self.assertEqual(context.exception.status_code, 404)
+        self.contacts_cache.bump.assert_not_awaited()
 
     async def test_get_future_birthdays(self):
         future_birthday_contacts = [Contact(), Contact()]
-        self.session.query().filter().all.return_value = future_birthday_contacts
+        self.result.scalars().all.return_value = future_birthday_contacts
 
         future_birthdays = await get_future_birthdays(user=self.user, db=self.session)
         self.assertEqual(future_birthdays, future_birthday_contacts)
 
+    async def test_get_future_birthdays_across_new_year(self):
+        self.result.scalars().all.return_value = []
+        await get_future_birthdays(user=self.user, db=self.session, days=365)
+        stmt = self.session.execute.call_args.args[0]
+        self.assertIn(" OR ", str(stmt))
+
+    def test_birthday_key(self):
+        contact = Contact(birthday=date(1990, 12, 31))
+        self.assertEqual(contact.birthday_key, 1231)
+        contact.birthday = date(1990, 2, 1)
+        self.assertEqual(contact.birthday_key, 201)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,10 +1,10 @@
 import sys
 import os
 from dotenv import load_dotenv
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 load_dotenv()
@@ -14,7 +14,6 @@ from src.schemas import UserModel
 from src.repository.users import (
     get_user_by_email,
     create_user,
-    update_token,
     confirmed_email,
     update_avatar,
 )
@@ -23,12 +22,17 @@ from src.repository.users import (
 class TestUsers(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = AsyncMock(spec=AsyncSession)
+        self.result = MagicMock()
+        self.session.execute.return_value = self.result
+        patcher = patch("src.repository.users.user_cache", AsyncMock())
+        self.user_cache = patcher.start()
+        self.addCleanup(patcher.stop)
         self.user = User(id=1)
 
     async def test_get_user_by_email(self):
         email = "test@example.com"
-        self.session.query().filter().first.return_value = self.user
+        self.result.scalar_one_or_none.return_value = self.user
         result = await get_user_by_email(email, db=self.session)
         self.assertEqual(result, self.user)
 
@@ -40,25 +44,21 @@ class TestUsers(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result_user.email, user_data.email)
         self.assertEqual(result_user.password, user_data.password)
 
-    async def test_update_token(self):
-        token = "test_token"
-        await update_token(user=self.user, token=token, db=self.session)
-        self.assertEqual(self.user.refresh_token, token)
-
-
     async def test_confirmed_email(self):
         email = "test@example.com"
         user = MagicMock(confirmed=False)
-        self.session.query().filter().first.return_value = user
+        self.result.scalar_one_or_none.return_value = user
         await confirmed_email(email, bd=self.session)
         self.assertTrue(user.confirmed)
+        self.user_cache.write.assert_awaited_once_with(user)
 
     async def test_update_avatar(self):
         url = "https://example.com/avatar.jpg"
         self.user.avatar = None
-        self.session.query().filter().first.return_value = self.user
+        self.result.scalar_one_or_none.return_value = self.user
         result_user = await update_avatar(self.user.email, url, db=self.session)
         self.assertEqual(result_user.avatar, url)
+        self.user_cache.write.assert_awaited_once_with(self.user)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import fakeredis
+from fastapi import HTTPException
+from jose import jwt
+
+from src.services.auth import Auth
+from src.services.refresh_tokens import RefreshTokenStore
+from src.services.token_cache import TokenCache
+from src.services.token_versions import TokenVersions
+
+
+class TestAccessTokenCache(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.auth = Auth()
+        self.auth.token_cache = TokenCache(maxsize=100)
+        self.auth.refresh_tokens = AsyncMock()
+        self.token = await self.auth.create_access_token(data={"sub": "oivanko@testmail.com"})
+
+    async def test_decode_is_cached(self):
+        with patch("src.services.auth.jwt.decode", wraps=jwt.decode) as decode:
+            first = await self.auth.decode_access_token(self.token)
+            second = await self.auth.decode_access_token(self.token)
+        self.assertEqual(first["sub"], "oivanko@testmail.com")
+        self.assertEqual(first, second)
+        decode.assert_called_once()
+
+    async def test_refresh_token_is_not_an_access_token(self):
+        token = await self.auth.create_refresh_token(data={"sub": "oivanko@testmail.com"})
+        with self.assertRaises(HTTPException):
+            await self.auth.decode_access_token(token)
+
+    async def test_expired_token_is_not_cached(self):
+        token = await self.auth.create_access_token(data={"sub": "oivanko@testmail.com"}, expires_delta=-1)
+        with self.assertRaises(HTTPException):
+            await self.auth.decode_access_token(token)
+        self.assertIsNone(self.auth.token_cache.get(token))
+
+
+class TestRefreshTokens(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.redis = fakeredis.FakeAsyncRedis()
+        self.auth = Auth()
+        self.auth.refresh_tokens = RefreshTokenStore(self.redis)
+        self.token = await self.auth.create_refresh_token(data={"sub": "oivanko@testmail.com"})
+        self.claims = jwt.get_unverified_claims(self.token)
+
+    async def test_token_state_expires_with_token(self):
+        jti_ttl = await self.redis.ttl(RefreshTokenStore.token_key(self.claims["jti"]))
+        family_ttl = await self.redis.ttl(RefreshTokenStore.family_key(self.claims["fam"]))
+        self.assertAlmostEqual(jti_ttl, 7 * 24 * 3600, delta=5)
+        self.assertAlmostEqual(family_ttl, 7 * 24 * 3600, delta=5)
+
+    async def test_rotation_keeps_family(self):
+        claims = await self.auth.rotate_refresh_token(self.token)
+        token = await self.auth.create_refresh_token(data={"sub": claims["sub"]}, family=claims["fam"])
+        rotated = jwt.get_unverified_claims(token)
+        self.assertEqual(rotated["fam"], self.claims["fam"])
+        self.assertNotEqual(rotated["jti"], self.claims["jti"])
+        self.assertEqual((await self.auth.rotate_refresh_token(token))["sub"], "oivanko@testmail.com")
+
+    async def test_reuse_revokes_family(self):
+        await self.auth.rotate_refresh_token(self.token)
+        token = await self.auth.create_refresh_token(data={"sub": "oivanko@testmail.com"}, family=self.claims["fam"])
+        with self.assertRaises(HTTPException) as context:
+            await self.auth.rotate_refresh_token(self.token)
+        self.assertEqual(context.exception.status_code, 401)
+        self.assertFalse(await self.redis.exists(RefreshTokenStore.family_key(self.claims["fam"])))
+        with self.assertRaises(HTTPException):
+            await self.auth.rotate_refresh_token(token)
+
+    async def test_revoke_family(self):
+        await self.auth.revoke_refresh_token(self.token)
+        with self.assertRaises(HTTPException):
+            await self.auth.rotate_refresh_token(self.token)
+
+    async def test_token_without_id_is_rejected(self):
+        token = jwt.encode({"sub": "oivanko@testmail.com", "scope": "refresh_token"}, Auth.SECRET_KEY, algorithm=Auth.ALGORITHM)
+        with self.assertRaises(HTTPException) as context:
+            await self.auth.rotate_refresh_token(token)
+        self.assertEqual(context.exception.detail, "Invalid refresh token")
+
+
+class TestPrincipal(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.redis = fakeredis.FakeAsyncRedis()
+        self.auth = Auth()
+        self.auth.token_cache = TokenCache(maxsize=100)
+        self.auth.token_versions = TokenVersions(self.redis, local_size=100, local_ttl=60)
+        self.token = await self.auth.create_access_token(data={"sub": "oivanko@testmail.com", "uid": 7})
+
+    async def test_token_carries_user_claims(self):
+        claims = jwt.get_unverified_claims(self.token)
+        self.assertEqual(claims["uid"], 7)
+        self.assertEqual(claims["ver"], await self.auth.token_versions.get(7))
+
+    async def test_principal_skips_user_lookup(self):
+        with patch.object(self.auth, "get_current_user") as get_current_user:
+            user = await self.auth.get_current_principal(self.token, db=None)
+        get_current_user.assert_not_called()
+        self.assertEqual(user.id, 7)
+        self.assertEqual(user.email, "oivanko@testmail.com")
+
+    async def test_bump_invalidates_outstanding_tokens(self):
+        await self.auth.get_current_principal(self.token, db=None)
+        await self.auth.revoke_user_tokens(7)
+        with self.assertRaises(HTTPException) as context:
+            await self.auth.get_current_principal(self.token, db=None)
+        self.assertEqual(context.exception.status_code, 401)
+        token = await self.auth.create_access_token(data={"sub": "oivanko@testmail.com", "uid": 7})
+        self.assertEqual((await self.auth.get_current_principal(token, db=None)).id, 7)
+
+    async def test_lost_version_does_not_revalidate_tokens(self):
+        await self.auth.revoke_user_tokens(7)
+        await self.redis.delete(TokenVersions.KEY)
+        self.auth.token_versions.local.clear()
+        with self.assertRaises(HTTPException):
+            await self.auth.decode_access_token(self.token)
+
+    async def test_token_without_user_claims_falls_back(self):
+        token = await self.auth.create_access_token(data={"sub": "oivanko@testmail.com"})
+        with patch.object(self.auth, "get_current_user", AsyncMock(return_value="user")) as get_current_user:
+            self.assertEqual(await self.auth.get_current_principal(token, db=None), "user")
+        get_current_user.assert_awaited_once_with(token, None)
+
+    async def test_user_claims_can_be_disabled(self):
+        self.auth.USER_CLAIMS = False
+        token = await self.auth.create_access_token(data={"sub": "oivanko@testmail.com", "uid": 7})
+        self.assertNotIn("uid", jwt.get_unverified_claims(token))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from unittest.mock import patch
+
+from jinja2 import FileSystemLoader, StrictUndefined, UndefinedError
+
+from src.services.templates import TemplateService
+
+
+class TestTemplateService(unittest.TestCase):
+
+    def setUp(self):
+        self.templates = TemplateService()
+        self.context = {"host": "http://testserver/", "username": "oivanko", "token": "abc"}
+
+    def test_render(self):
+        html = self.templates.render("email_template.html", **self.context)
+        self.assertIn("Hi oivanko,", html)
+        self.assertIn('href="http://testserver/api/auth/confirmed_email/abc"', html)
+
+    def test_autoescape(self):
+        html = self.templates.render(
+            "email_template.html", **{**self.context, "username": "<b>x</b>"}
+        )
+        self.assertIn("&lt;b&gt;x&lt;/b&gt;", html)
+
+    def test_loaded_templates_skip_the_file_system(self):
+        self.templates.load()
+        with patch.object(FileSystemLoader, "get_source") as get_source:
+            for _ in range(3):
+                self.templates.render("email_template.html", **self.context)
+        get_source.assert_not_called()
+
+    def test_render_many(self):
+        contexts = [{**self.context, "username": f"user{i}"} for i in range(5)]
+        rendered = self.templates.render_many("email_template.html", contexts)
+        self.assertEqual(
+            rendered,
+            [self.templates.render("email_template.html", **context) for context in contexts],
+        )
+
+    def test_render_many_reports_template_errors(self):
+        self.templates.environment.undefined = StrictUndefined
+        with self.assertRaises(UndefinedError):
+            self.templates.render_many("email_template.html", [{"username": "oivanko"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
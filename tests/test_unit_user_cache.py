@@ -0,0 +1,196 @@
+import asyncio
+import unittest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import fakeredis
+
+from redis.exceptions import ConnectionError
+
+from src.database.models import User
+from src.services.ttl_cache import TTLCache
+from src.services.user_cache import UserCache
+
+
+class TestUserCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.client = AsyncMock()
+        self.cache = UserCache(self.client, ttl=900)
+        self.user = User(
+            id=1,
+            username="oivanko",
+            email="oivanko@testmail.com",
+            password="hashed",
+            created_at=datetime(2024, 2, 26, 23, 31, 36),
+            avatar="https://example.com/avatar.jpg",
+            confirmed=True,
+        )
+
+    def test_dump_is_a_projection(self):
+        payload = self.cache.dump(self.user)
+        self.assertNotIn(b"hashed", payload)
+        user = self.cache.load(payload)
+        self.assertIsInstance(user, User)
+        for field in UserCache.FIELDS:
+            self.assertEqual(getattr(user, field), getattr(self.user, field))
+
+    def test_load_other_version(self):
+        self.assertIsNone(self.cache.load(b'{"v":0,"id":1}'))
+
+    async def test_set_uses_single_command(self):
+        await self.cache.set(self.user)
+        self.client.set.assert_awaited_once_with(
+            "user:v2:oivanko@testmail.com", self.cache.dump(self.user), ex=900, nx=True
+        )
+        self.client.expire.assert_not_called()
+
+    async def test_get_hit(self):
+        self.client.get.return_value = self.cache.dump(self.user)
+        user = await self.cache.get(self.user.email)
+        self.assertEqual(user.id, self.user.id)
+
+    async def test_get_miss(self):
+        self.client.get.return_value = None
+        self.assertIsNone(await self.cache.get(self.user.email))
+
+    async def test_redis_failure_is_a_miss(self):
+        self.client.get.side_effect = ConnectionError()
+        self.assertIsNone(await self.cache.get(self.user.email))
+
+    async def test_local_tier_avoids_redis(self):
+        cache = UserCache(self.client, ttl=900, local_size=10, local_ttl=60)
+        self.client.get.return_value = self.cache.dump(self.user)
+        first = await cache.get(self.user.email)
+        second = await cache.get(self.user.email)
+        self.client.get.assert_awaited_once()
+        self.assertIsNot(first, second)
+        self.assertEqual(second.avatar, self.user.avatar)
+        self.assertEqual(cache.snapshot()["local"]["hits"], 1)
+
+    async def test_invalidate_evicts_and_publishes(self):
+        cache = UserCache(self.client, ttl=900, local_size=10, local_ttl=60)
+        pipe = MagicMock(execute=AsyncMock())
+        self.client.pipeline = MagicMock()
+        self.client.pipeline.return_value.__aenter__.return_value = pipe
+        await cache.set(self.user)
+        await cache.invalidate(self.user.email)
+        self.assertEqual(len(cache.local), 0)
+        pipe.delete.assert_called_once_with("user:v2:oivanko@testmail.com")
+        pipe.publish.assert_called_once_with(UserCache.CHANNEL, self.user.email)
+        pipe.execute.assert_awaited_once()
+
+    async def test_write_through(self):
+        cache = UserCache(self.client, ttl=900, local_size=10, local_ttl=60)
+        pipe = MagicMock(execute=AsyncMock())
+        self.client.pipeline = MagicMock()
+        self.client.pipeline.return_value.__aenter__.return_value = pipe
+        await cache.set(self.user)
+        self.user.avatar = "https://example.com/new.jpg"
+        await cache.write(self.user)
+        self.assertEqual(len(cache.local), 0)
+        pipe.set.assert_called_once_with(
+            "user:v2:oivanko@testmail.com", cache.dump(self.user), ex=900
+        )
+        pipe.publish.assert_called_once_with(UserCache.CHANNEL, self.user.email)
+
+
+class TestUserCacheSingleFlight(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeAsyncRedis()
+        self.cache = UserCache(self.redis, ttl=900, local_size=10, local_ttl=60)
+        self.user = User(
+            id=1,
+            username="oivanko",
+            email="oivanko@testmail.com",
+            created_at=datetime(2024, 2, 26, 23, 31, 36),
+            confirmed=True,
+        )
+        self.loader = AsyncMock(side_effect=self.load)
+
+    async def load(self):
+        await asyncio.sleep(0.05)
+        return self.user
+
+    async def test_concurrent_misses_load_once(self):
+        users = await asyncio.gather(
+            *(self.cache.get_or_load(self.user.email, self.loader) for _ in range(20))
+        )
+        self.loader.assert_awaited_once()
+        self.assertEqual({user.id for user in users}, {1})
+        self.assertEqual(len({id(user) for user in users}), 20)
+        self.assertEqual(self.cache.coalesced, 19)
+        self.assertIsNotNone(await self.redis.get(UserCache.key(self.user.email)))
+
+    async def test_concurrent_misses_across_workers_load_once(self):
+        other = UserCache(self.redis, ttl=900, local_size=10, local_ttl=60)
+        first, second = await asyncio.gather(
+            self.cache.get_or_load(self.user.email, self.loader),
+            other.get_or_load(self.user.email, self.loader),
+        )
+        self.loader.assert_awaited_once()
+        self.assertEqual(first.email, second.email)
+        self.assertEqual(self.cache.lock_waits + other.lock_waits, 1)
+
+    async def test_missing_user_is_not_cached(self):
+        loader = AsyncMock(return_value=None)
+        self.assertIsNone(await self.cache.get_or_load(self.user.email, loader))
+        self.assertIsNone(await self.redis.get(UserCache.key(self.user.email)))
+        self.assertFalse(await self.redis.exists(UserCache.lock_key(self.user.email)))
+
+    async def test_loader_error_reaches_every_waiter(self):
+        loader = AsyncMock(side_effect=RuntimeError("db down"))
+        results = await asyncio.gather(
+            *(self.cache.get_or_load(self.user.email, loader) for _ in range(3)),
+            return_exceptions=True,
+        )
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        self.assertEqual(self.cache._inflight, {})
+
+    async def test_early_refresh(self):
+        await self.cache.set(self.user, load_time=0.01)
+        self.cache.local.clear()
+        self.user.avatar = "https://example.com/new.jpg"
+        with patch.object(self.cache, "should_refresh", return_value=True):
+            await self.cache.get_or_load(self.user.email, self.loader)
+        self.loader.assert_awaited_once()
+        cached = UserCache.load(await self.redis.get(UserCache.key(self.user.email)))
+        self.assertEqual(cached.avatar, "https://example.com/new.jpg")
+        self.assertEqual(self.cache.early_refreshes, 1)
+
+    async def test_early_refresh_keeps_written_through_value(self):
+        key = UserCache.key(self.user.email)
+        await self.redis.set(key, UserCache.dump(self.user))
+        self.user.username = "written"
+        await self.cache._refresh(self.user.email, b"stale", self.loader)
+        self.assertEqual(UserCache.load(await self.redis.get(key)).username, "oivanko")
+
+    def test_should_refresh(self):
+        self.assertFalse(self.cache.should_refresh(0, 0.001))
+        self.assertFalse(self.cache.should_refresh(0.01, 3600))
+        with patch("src.services.user_cache.random.random", return_value=0.99):
+            self.assertTrue(self.cache.should_refresh(0.01, 0.04))
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.snapshot()["evictions"], 1)
+
+    def test_expiry(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1, ttl=0)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.snapshot()["expirations"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import asyncio
+import logging
+import signal
+
+from src.conf.config import settings
+from src.services import avatars, email  # noqa: F401  registers the job handlers
+from src.services.mailer import mailer
+from src.services.outbox import avatar_outbox, email_outbox
+from src.services.templates import template_service
+
+
+async def main():
+    """
+    Background worker: consumes the email outbox and delivers the messages over pooled SMTP
+    connections, and consumes the avatar outbox and stores the uploaded avatars. Run as
+    many worker processes as the throughput needs.
+    """
+    task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, task.cancel)
+
+    template_service.load()
+    mailer.start()
+    try:
+        await asyncio.gather(
+            email_outbox.run(count=settings.email_worker_concurrency),
+            avatar_outbox.run(count=settings.avatar_worker_concurrency),
+        )
+    except asyncio.CancelledError:
+        pass
+    finally:
+        # Unacknowledged jobs stay pending and are claimed again by another worker
+        await mailer.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())